@@ -0,0 +1,103 @@
+"""
+This module rates many osu maina maps at once on a pool of worker processes
+and yields one result per map as soon as it is done.
+"""
+
+import os
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import partial
+from typing import Any, TypeVar
+
+import calc
+from cache import ResultCache
+from parse import parse_map
+
+# How many maps are queued per worker, so a huge corpus isn't submitted at once
+PENDING_PER_WORKER = 4
+
+T = TypeVar("T")
+
+# Result caches opened by open_cache, by (process id, cache path)
+OPEN_CACHES: dict[tuple[int, str], ResultCache] = {}
+
+
+def open_cache(cache_path: str) -> ResultCache:
+    """
+    The result cache of this process, opened once per process
+    (a sqlite connection can't be shared with forked workers)
+    """
+    key = (os.getpid(), cache_path)
+
+    if key not in OPEN_CACHES:
+        OPEN_CACHES[key] = ResultCache(cache_path)
+
+    return OPEN_CACHES[key]
+
+
+def rate_file(path: str, cache_path: str | None = None) -> dict[str, Any]:
+    """
+    Returns {"path", "key_count", "stats"} of a map,
+    or {"path", "error": {"type", "message"}} if it can't be rated.
+    """
+    try:
+        if cache_path is not None:
+            return {"path": path, **open_cache(cache_path).rate_file(path)}
+
+        m = parse_map(path)
+
+        return {"path": path, "key_count": m.key_count, "stats": calc.from_map(m)}
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return {"path": path, "error": {"type": type(e).__name__, "message": str(e)}}
+
+
+def rate_on_pool(
+    rate: Callable[[T], dict[str, Any]],
+    items: Iterable[T],
+    workers: int | None = None,
+    initializer: Callable[..., object] | None = None,
+    initargs: tuple[Any, ...] = (),
+) -> Iterator[dict[str, Any]]:
+    """
+    Calls rate on every item on a process pool (one worker per core by default),
+    keeping at most PENDING_PER_WORKER items per worker in flight.
+    initializer(*initargs) runs once in every worker.
+    Results are yielded in the order the workers finish, not in the order of items.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        pending: set[Future[dict[str, Any]]] = set()
+
+        for item in items:
+            pending.add(executor.submit(rate, item))
+
+            if len(pending) < workers * PENDING_PER_WORKER:
+                continue
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def rate_files(
+    paths: Iterable[str], workers: int | None = None, cache_path: str | None = None
+) -> Iterator[dict[str, Any]]:
+    """
+    Rates the maps on a process pool (one worker per core by default).
+    Results are yielded in the order the workers finish, not in the order of paths.
+    """
+    yield from rate_on_pool(
+        partial(rate_file, cache_path=cache_path),
+        paths,
+        workers,
+        None if cache_path is None else open_cache,
+        () if cache_path is None else (cache_path,),
+    )
@@ -0,0 +1,207 @@
+"""
+This module benchmarks every stage of the rating on the maps in test_files
+(or any given maps), per file and per pack (the directory of the map).
+
+python bench.py --save baseline.json
+python bench.py --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import calc
+import map_files
+from parse import MainaMap, parse_map
+
+STAGES = ("parse", "build", "hold", "release")
+
+# A stage is reported as a regression if it is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.15
+
+
+def time_best(func: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    """
+    Returns (the fastest time of repeat runs, the result of the last run)
+    """
+    best = float("inf")
+    result = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def build_dicts(m: MainaMap) -> MainaMap:
+    """
+    MainaMap construction, the dicts are only built when they are accessed
+    """
+    new_m = MainaMap(m.key_count, m.notes)
+    _ = new_m.hold_notes_dict, new_m.release_notes_dict
+    return new_m
+
+
+def run_stages(path: str) -> None:
+    """
+    Every stage once, for measuring the memory
+    """
+    m = build_dicts(parse_map(path))
+    calc.calc_4k_hold_note_pattern_stats(m.hold_notes_dict)
+
+    if len(m.release_notes_dict) >= 2:
+        calc.calc_4k_release_note_pattern_stats(m.hold_notes_dict, m.release_notes_dict)
+
+
+def bench_file(path: str, repeat: int) -> dict[str, Any]:
+    """
+    Seconds of each stage, notes per second and peak memory of a map
+    """
+    seconds: dict[str, float] = {}
+
+    seconds["parse"], m = time_best(lambda: parse_map(path), repeat)
+    seconds["build"], m = time_best(lambda: build_dicts(m), repeat)
+    seconds["hold"], _ = time_best(
+        lambda: calc.calc_4k_hold_note_pattern_stats(m.hold_notes_dict), repeat
+    )
+
+    if len(m.release_notes_dict) >= 2:
+        seconds["release"], _ = time_best(
+            lambda: calc.calc_4k_release_note_pattern_stats(
+                m.hold_notes_dict, m.release_notes_dict
+            ),
+            repeat,
+        )
+
+    tracemalloc.start()
+    run_stages(path)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    note_count = len(m.notes)
+    total = sum(seconds.values())
+
+    return {
+        "pack": os.path.basename(os.path.dirname(path)),
+        "notes": note_count,
+        "seconds": seconds,
+        "notes_per_second": note_count / total if total else 0.0,
+        "peak_memory": peak_memory,
+    }
+
+
+def summarize_packs(results: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """
+    Sums the files of each pack
+    """
+    packs: dict[str, dict[str, Any]] = {}
+
+    for result in results.values():
+        pack = packs.setdefault(
+            result["pack"],
+            {"files": 0, "notes": 0, "seconds": {stage: 0.0 for stage in STAGES}, "peak_memory": 0},
+        )
+        pack["files"] += 1
+        pack["notes"] += result["notes"]
+        pack["peak_memory"] = max(pack["peak_memory"], result["peak_memory"])
+
+        for stage, seconds in result["seconds"].items():
+            pack["seconds"][stage] += seconds
+
+    for pack in packs.values():
+        total = sum(pack["seconds"].values())
+        pack["notes_per_second"] = pack["notes"] / total if total else 0.0
+
+    return packs
+
+
+def find_regressions(
+    current: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    """
+    Stages of files and packs which got slower than the baseline by more than threshold
+    """
+    regressions: list[str] = []
+
+    for kind in ("files", "packs"):
+        for name, result in current[kind].items():
+            if name not in baseline[kind]:
+                continue
+
+            for stage, seconds in result["seconds"].items():
+                base_seconds = baseline[kind][name]["seconds"].get(stage)
+
+                if base_seconds and seconds > base_seconds * (1 + threshold):
+                    regressions.append(
+                        f"{name} [{stage}]: {base_seconds * 1000:.2f} ms -> {seconds * 1000:.2f} ms"
+                        f" (+{(seconds / base_seconds - 1) * 100:.0f}%)"
+                    )
+
+    return regressions
+
+
+def print_packs(packs: dict[str, dict[str, Any]]) -> None:
+    """
+    Prints a table of the packs
+    """
+    print(
+        f"{'pack':<12}{'files':>6}{'notes':>9}"
+        + "".join(f"{stage + ' ms':>12}" for stage in STAGES)
+        + f"{'notes/s':>12}{'peak KiB':>10}"
+    )
+
+    for name, pack in sorted(packs.items()):
+        print(
+            f"{name:<12}{pack['files']:>6}{pack['notes']:>9}"
+            + "".join(f"{pack['seconds'][stage] * 1000:>12.1f}" for stage in STAGES)
+            + f"{pack['notes_per_second']:>12.0f}{pack['peak_memory'] / 1024:>10.0f}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Entry point of the command line, returns 1 if a regression is found
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks the rating stages.")
+    parser.add_argument(
+        "paths", nargs="*", default=["test_files"], help="maps, directories or globs"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the fastest is kept")
+    parser.add_argument("--save", metavar="PATH", help="saves the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compares the results to a baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    files = {
+        path: bench_file(path, args.repeat) for path in map_files.find_map_files(args.paths)
+    }
+    current = {"files": files, "packs": summarize_packs(files)}
+
+    print_packs(current["packs"])
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=4)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            regressions = find_regressions(current, json.load(file), args.threshold)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
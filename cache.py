@@ -0,0 +1,141 @@
+"""
+This module caches the pattern stats of maps on disk, keyed by the content of the map
+and the version of the algorithm (see calc.get_algorithm_version).
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+from typing import Any
+
+import calc
+from parse import parse_lines
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "maina-map-pattern-stats", "results.sqlite3"
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResultCache:
+    """
+    Results stored in a sqlite database.
+    The least recently used results are evicted once they take more than max_bytes.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.max_bytes = max_bytes
+        self.version = calc.get_algorithm_version()
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+        )
+        # Running total of the sizes, only counted again when it goes over max_bytes
+        self.total_size = self.__get_total_size()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the database
+        """
+        self.connection.close()
+
+    def get_key(self, data: bytes) -> str:
+        """
+        A hash of the map file and the algorithm version
+        """
+        return hashlib.sha256(self.version.encode() + data).hexdigest()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """
+        Returns the cached result or None
+        """
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self.connection.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        """
+        Stores a result and evicts the least recently used ones if the cache is full
+        """
+        encoded = json.dumps(value)
+
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT size FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, encoded, len(encoded), time.time()),
+            )
+            self.total_size += len(encoded) - (row[0] if row else 0)
+
+            if self.total_size > self.max_bytes:
+                self.__evict()
+
+    def __get_total_size(self) -> int:
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def __evict(self) -> None:
+        # Other processes may have written or evicted results since the total was counted
+        self.total_size = self.__get_total_size()
+
+        if self.total_size <= self.max_bytes:
+            return
+
+        evicted_keys: list[tuple[str]] = []
+
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM results ORDER BY last_used"
+        ):
+            if self.total_size <= self.max_bytes:
+                break
+
+            evicted_keys.append((key,))
+            self.total_size -= size
+
+        self.connection.executemany("DELETE FROM results WHERE key = ?", evicted_keys)
+
+    def rate_file(self, file_path: str) -> dict[str, Any]:
+        """
+        Returns {"key_count", "stats"} of a map, from the cache if the same map was rated before
+        """
+        with open(file_path, "rb") as file:
+            data = file.read()
+
+        key = self.get_key(data)
+        result = self.get(key)
+
+        if result is None:
+            m = parse_lines(io.StringIO(data.decode("utf-8"), newline=None))
+            result = {"key_count": m.key_count, "stats": calc.from_map(m)}
+            self.put(key, result)
+
+        return result
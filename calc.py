@@ -1,14 +1,25 @@
 """
 This module contains classes and functions to calculate pattern statistics
 """
-# pylint: disable=too-many-return-statements, too-many-branches
+# pylint: disable=too-many-return-statements, too-many-branches, too-many-arguments, too-many-positional-arguments
+# pylint: disable=too-many-instance-attributes
 
+import hashlib
 import json
 from enum import Enum
+from functools import cache, partial
+from itertools import product
 import math
+from collections.abc import Callable, Iterator
+from typing import TYPE_CHECKING
+
+from profiling import Profiler, get_env_profiler
 
 from parse import MainaMap, parse_map
 
+if TYPE_CHECKING:
+    from cache import ResultCache
+
 
 class ChordType(Enum):
     """
@@ -41,6 +52,35 @@ class PatternType(Enum):
     # TODO : patterns for higher key modes than 4k
 
 
+HOLD_NOTE_PATTERN_WEIGHTS: dict[PatternType, float] = {
+    PatternType.SINGLE_STREAM: 0.91, #x
+    PatternType.JUMP_STREAM: 1.7, #x
+    # lower then split trill since it may not be a trill.
+    PatternType.HAND_STREAM: 4.3, #x
+    PatternType.SPEED_JACK: 2.5, #x
+    PatternType.LIGHT_CHORD_JACK: 2.9, #x
+    PatternType.DENSE_CHORD_JACK: 5.298, #x
+    PatternType.JUMP_TRILL: 2.81,  # x
+    PatternType.SPLIT_TRILL: 5.692, #x
+}
+
+RELEASE_NOTE_PATTERN_WEIGHTS: dict[PatternType, float] = {
+    PatternType.SINGLE_STREAM: 0.91,
+    PatternType.JUMP_STREAM: 1.92,
+    # lower then split trill since it may not be a trill.
+    PatternType.HAND_STREAM: 4.2,
+    PatternType.SPEED_JACK: 2.2,
+    PatternType.LIGHT_CHORD_JACK: 2.8,
+    PatternType.DENSE_CHORD_JACK: 5.3,
+    PatternType.JUMP_TRILL: 2.7,
+    PatternType.SPLIT_TRILL: 6,
+}
+
+# The chord the last chord is classified against
+DUMMY_CHORD = [3]
+DUMMY_CHORD_MASK = 0b1000
+
+
 def is_consecutive(li: list[int]) -> bool:
     """
     Returns True if the elements in the list are consecutive, False otherwise.
@@ -187,6 +227,237 @@ def get_pattern_type(
     )
 
 
+def get_chord_mask(note_indexes: list[int]) -> int:
+    """
+    Returns the columns of a 4k chord as a bitmask (#x#x -> 0b0101),
+    or 0 if the chord can't be looked up in PATTERN_TABLE.
+    """
+    mask = 0
+
+    for index in note_indexes:
+        if not 0 <= index < 4 or mask & (1 << index):
+            return 0
+
+        mask |= 1 << index
+
+    return mask
+
+
+def get_pattern_table_index(
+    mask1: int, mask2: int, mask3: int, same12: bool, same13: bool
+) -> int:
+    """
+    same12, same13 : whether note_indexes1 equals note_indexes2, note_indexes3 as a list
+    """
+    return (((mask1 << 4 | mask2) << 4 | mask3) << 2) | same12 << 1 | same13
+
+
+def build_pattern_table() -> list[PatternType | None]:
+    """
+    Classifies every triple of 4k chords with get_pattern_type.
+    get_pattern_type compares chords as lists ([0, 3] != [3, 0]),
+    so the table is also keyed by the list equality of the first chord to the others.
+    """
+    table: list[PatternType | None] = [None] * (16 * 16 * 16 * 4)
+
+    def get_chord(mask: int, reverse: bool) -> list[int]:
+        chord = [index for index in range(4) if mask & (1 << index)]
+        return chord[::-1] if reverse else chord
+
+    def get_equalities(mask1: int, mask2: int) -> list[bool]:
+        if mask1 != mask2:
+            return [False]
+
+        if mask1 & (mask1 - 1) == 0:  # a single note is always equal to itself
+            return [True]
+
+        return [True, False]
+
+    for mask1, mask2, mask3 in product(range(1, 16), repeat=3):
+        for same12, same13 in product(
+            get_equalities(mask1, mask2), get_equalities(mask1, mask3)
+        ):
+            table[get_pattern_table_index(mask1, mask2, mask3, same12, same13)] = (
+                get_pattern_type(
+                    get_chord(mask1, False),
+                    get_chord(mask2, not same12),
+                    get_chord(mask3, not same13),
+                )
+            )
+
+    return table
+
+
+PATTERN_TABLE = build_pattern_table()
+
+
+def lookup_pattern_type(
+    note_indexes1: list[int],
+    mask1: int,
+    note_indexes2: list[int],
+    mask2: int,
+    note_indexes3: list[int],
+    mask3: int,
+) -> PatternType:
+    """
+    Same as get_pattern_type but looks the pattern up in PATTERN_TABLE.
+    The masks are from get_chord_mask.
+    """
+    if mask1 and mask2 and mask3:
+        pattern_type = PATTERN_TABLE[
+            get_pattern_table_index(
+                mask1,
+                mask2,
+                mask3,
+                mask1 == mask2 and note_indexes1 == note_indexes2,
+                mask1 == mask3 and note_indexes1 == note_indexes3,
+            )
+        ]
+
+        if pattern_type is not None:
+            return pattern_type
+
+    return get_pattern_type(note_indexes1, note_indexes2, note_indexes3)
+
+
+def get_column_mask(note_indexes: list[int]) -> int:
+    """
+    Returns the columns of a chord of any key mode as a bitmask (#x#x -> 0b0101)
+    """
+    mask = 0
+
+    for index in note_indexes:
+        mask |= 1 << index
+
+    return mask
+
+
+def is_consecutive_mask(mask: int) -> bool:
+    """
+    Same as is_consecutive for a bitmask: the set bits form a single run
+    """
+    run = mask >> ((mask & -mask).bit_length() - 1)
+    return run & (run + 1) == 0
+
+
+def get_chord_type_from_mask(mask: int) -> ChordType:
+    """
+    Same as get_chord_type for a bitmask, for any key mode
+    """
+    size = mask.bit_count()
+
+    if size == 1:
+        return ChordType.SINGLE
+
+    if size == 2:
+        return ChordType.JUMP if is_consecutive_mask(mask) else ChordType.BROKEN_JUMP
+
+    if size == 3:
+        return ChordType.HAND if is_consecutive_mask(mask) else ChordType.BROKEN_HAND
+
+    if size == 4:
+        return ChordType.QUAD
+
+    return ChordType.MORE_THAN_QUAD
+
+
+def get_hand_masks(key_count: int) -> tuple[int, int]:
+    """
+    Returns the columns of (the left hand, the right hand) as bitmasks.
+    The middle column of an odd key mode belongs to neither hand.
+    """
+    left_hand = (1 << (key_count // 2)) - 1
+    right_hand = ((1 << key_count) - 1) & ~((1 << ((key_count + 1) // 2)) - 1)
+
+    return left_hand, right_hand
+
+
+def get_inner_mask(key_count: int) -> int:
+    """
+    Returns every column except the two outermost ones as a bitmask (4k : 0b0110)
+    """
+    return ((1 << key_count) - 1) & ~(1 | 1 << (key_count - 1))
+
+
+def get_pattern_type_from_masks(
+    mask1: int,
+    mask2: int,
+    mask3: int,
+    key_count: int,
+    same12: bool | None = None,
+    same13: bool | None = None,
+) -> PatternType:
+    """
+    Same as get_pattern_type for chords given as bitmasks, for any key mode.
+    Chords of more than four notes are classified like quads.
+    same12, same13 : whether chord 1 equals chord 2, chord 3 as a list
+    (defaults to the equality of the masks)
+    """
+    if same12 is None:
+        same12 = mask1 == mask2
+
+    if same13 is None:
+        same13 = mask1 == mask3
+
+    first_is_higher = mask1.bit_count() > mask2.bit_count()
+    higher_mask, lower_mask = (mask1, mask2) if first_is_higher else (mask2, mask1)
+    higher_type = get_chord_type_from_mask(higher_mask)
+    lower_is_single = lower_mask & (lower_mask - 1) == 0
+    third_is_single = mask3 & (mask3 - 1) == 0
+    is_overlap = higher_mask & lower_mask != 0
+
+    if higher_type == ChordType.SINGLE:
+        if is_overlap:
+            return PatternType.SPEED_JACK
+
+        if same13 and third_is_single:
+            if mask2 & get_inner_mask(key_count):
+                return PatternType.JUMP_TRILL
+
+            return PatternType.SPLIT_TRILL
+
+        return PatternType.SINGLE_STREAM
+
+    if higher_type == ChordType.JUMP:
+        if is_overlap:
+            return PatternType.SPEED_JACK if lower_is_single else PatternType.LIGHT_CHORD_JACK
+
+        if same13:
+            return PatternType.JUMP_TRILL
+
+        return PatternType.JUMP_STREAM
+
+    if higher_type == ChordType.BROKEN_JUMP:
+        if is_overlap:
+            return PatternType.SPEED_JACK if lower_is_single else PatternType.LIGHT_CHORD_JACK
+
+        # get_pattern_type compares the higher chord to both chords as lists
+        if (first_is_higher or same12) and third_is_single and not mask3 & lower_mask:
+            return PatternType.SINGLE_STREAM
+
+        if not first_is_higher and third_is_single and not mask3 & higher_mask:
+            return PatternType.SINGLE_STREAM
+
+        if same13:
+            return PatternType.SPLIT_TRILL
+
+        return PatternType.JUMP_STREAM
+
+    if higher_type in (ChordType.HAND, ChordType.BROKEN_HAND):
+        if is_overlap:
+            return PatternType.SPEED_JACK if lower_is_single else PatternType.DENSE_CHORD_JACK
+
+        return PatternType.HAND_STREAM
+
+    # QUAD, MORE_THAN_QUAD : a one hand jump against it is still a speed jack
+    if get_chord_type_from_mask(lower_mask) == ChordType.JUMP and any(
+        lower_mask & hand == lower_mask for hand in get_hand_masks(key_count)
+    ):
+        return PatternType.SPEED_JACK
+
+    return PatternType.DENSE_CHORD_JACK
+
+
 def get_point_from_hold_note_time_diff(time_diff: float) -> float:
     """
     A value which will be added to the pattern stat
@@ -216,6 +487,9 @@ def get_hold_note_lowest_time_diff(hold_notes: dict[float, list[int]]) -> float:
 def get_closest_release_time(
     hold_time: float, hold_note_index: int, release_notes: dict[float, list[int]]
 ) -> float | None:
+    """
+    Linear scan over release_notes, use MainaMap.get_next_release_time for repeated lookups.
+    """
     for release_time, note_objs in release_notes.items():
         if release_time > hold_time and hold_note_index in note_objs:
             return release_time
@@ -223,61 +497,216 @@ def get_closest_release_time(
     return None
 
 
-# TODO : add support for higher key modes than 4k in a separate function
-def calc_4k_hold_note_pattern_stats(
-    hold_notes_dict: dict[int, list[int]],
-) -> dict[PatternType, float]:
+def calc_ln_hold_stats(m: MainaMap) -> dict[str, float]:
     """
-    Calculates pattern stats for a 4k map.
+    How much of the map is played while holding long notes.
+    HELD_NOTE_RATIO : ratio of the chords hit while another column is held
+    MEAN_HELD_COLUMNS : average number of held columns when a chord is hit
     """
-    pattern_stats = {pattern: 0.0 for pattern in PatternType}
-    pattern_weights: dict[PatternType, float] = {
-        PatternType.SINGLE_STREAM: 0.91, #x
-        PatternType.JUMP_STREAM: 1.7, #x
-        # lower then split trill since it may not be a trill.
-        PatternType.HAND_STREAM: 4.3, #x
-        PatternType.SPEED_JACK: 2.5, #x
-        PatternType.LIGHT_CHORD_JACK: 2.9, #x
-        PatternType.DENSE_CHORD_JACK: 5.298, #x
-        PatternType.JUMP_TRILL: 2.81,  # x
-        PatternType.SPLIT_TRILL: 5.692, #x
+    note_count = sum(len(notes) for notes in m.hold_notes_dict.values())
+    durations = [
+        release_time - hold_time
+        for release_times, hold_times in m.release_index.values()
+        for release_time, hold_time in zip(release_times, hold_times)
+    ]
+
+    held_chord_count = 0
+    held_column_count = 0
+
+    for time, notes in m.hold_notes_dict.items():
+        held_columns = sum(
+            1
+            for index in m.release_index
+            if index not in notes and m.is_held(index, time)
+        )
+        held_column_count += held_columns
+        held_chord_count += held_columns > 0
+
+    chord_count = max(len(m.hold_notes_dict), 1)
+
+    return {
+        "LN_RATIO": len(durations) / max(note_count, 1),
+        "MEAN_HOLD_DURATION": sum(durations) / len(durations) if durations else 0.0,
+        "MAX_HOLD_DURATION": float(max(durations, default=0)),
+        "HELD_NOTE_RATIO": held_chord_count / chord_count,
+        "MEAN_HELD_COLUMNS": held_column_count / chord_count,
     }
 
-    prev_notes = list(hold_notes_dict.values())[0]
-    prev_time = list(hold_notes_dict.keys())[0]
 
-    prev_prev_notes = list(hold_notes_dict.values())[1]
+def lookup_n_key_pattern_type(
+    note_indexes1: list[int],
+    mask1: int,
+    note_indexes2: list[int],
+    mask2: int,
+    note_indexes3: list[int],
+    mask3: int,
+    key_count: int,
+) -> PatternType:
+    """
+    Same as lookup_pattern_type for key modes other than 4k (masks from get_column_mask)
+    """
+    return get_pattern_type_from_masks(
+        mask1,
+        mask2,
+        mask3,
+        key_count,
+        mask1 == mask2 and note_indexes1 == note_indexes2,
+        mask1 == mask3 and note_indexes1 == note_indexes3,
+    )
+
+
+def get_pattern_lookup(
+    key_count: int,
+) -> tuple[Callable[[list[int]], int], Callable[..., PatternType]]:
+    """
+    Returns (get_mask, lookup) for a key mode: 4k chords are looked up in PATTERN_TABLE,
+    other key modes are classified by their masks.
+    lookup takes (notes1, mask1, notes2, mask2, notes3, mask3) as lookup_pattern_type.
+    """
+    if key_count == 4:
+        return get_chord_mask, lookup_pattern_type
+
+    return get_column_mask, partial(lookup_n_key_pattern_type, key_count=key_count)
 
-    line_count = len(hold_notes_dict)
 
-    for time, notes in list(hold_notes_dict.items())[2:]:
-        pattern_type = get_pattern_type(prev_prev_notes, prev_notes, notes)
+class PatternStatsAccumulator:
+    """
+    Calculates the pattern stats of chords fed one by one in time order,
+    the same way calc_4k_hold_note_pattern_stats walks its dict.
+    4k chords are looked up in PATTERN_TABLE, other key modes are classified by their masks.
+    """
+
+    def __init__(self, pattern_weights: dict[PatternType, float], key_count: int = 4) -> None:
+        self.pattern_weights = pattern_weights
+        self.key_count = key_count
+
+        self.get_mask, self.lookup_pattern_type = get_pattern_lookup(key_count)
+
+        self.pattern_sums = {pattern: 0.0 for pattern in PatternType}
+        self.chord_count = 0
+
+        self.prev_prev_notes: list[int] = []
+        self.prev_prev_mask = 0
+        self.prev_notes: list[int] = []
+        self.prev_mask = 0
+        self.prev_time = 0
+
+        self.last_notes: list[int] = []
+        self.last_mask = 0
+        self.last_time = 0
+        self.second_last_time = 0
+
+    def add(self, time: int, notes: list[int]) -> None:
+        """
+        Adds the next chord
+        """
+        row = self.classify(time, notes)
+
+        if row is not None:
+            self.pattern_sums[row[0]] += get_point_from_hold_note_time_diff(row[1])
+
+    def classify(self, time: int, notes: list[int]) -> tuple[PatternType, int] | None:
+        """
+        Adds the next chord without scoring it, returns (pattern type, time diff) of its row,
+        None for the first two chords. add scores the row, the profiler times the two apart.
+        """
+        mask = self.get_mask(notes)
+        row = None
+
+        if self.chord_count == 0:
+            self.prev_notes, self.prev_mask, self.prev_time = notes, mask, time
+        elif self.chord_count == 1:
+            # The first two chords are swapped, kept as it is since the weights are tuned for it
+            self.prev_prev_notes, self.prev_prev_mask = notes, mask
+        else:
+            row = (
+                self.lookup_pattern_type(
+                    self.prev_prev_notes,
+                    self.prev_prev_mask,
+                    self.prev_notes,
+                    self.prev_mask,
+                    notes,
+                    mask,
+                ),
+                time - self.prev_time,
+            )
+
+            self.prev_prev_notes, self.prev_prev_mask = self.prev_notes, self.prev_mask
+            self.prev_notes, self.prev_mask, self.prev_time = notes, mask, time
+
+        self.second_last_time = self.last_time
+        self.last_notes, self.last_mask, self.last_time = notes, mask, time
+        self.chord_count += 1
+
+        return row
+
+    def score(self, pattern_type: PatternType, time_diff: int) -> None:
+        """
+        Adds the point of a row returned by classify
+        """
+        self.pattern_sums[pattern_type] += get_point_from_hold_note_time_diff(time_diff)
+
+    def get_pattern_stats(self) -> dict[PatternType, float]:
+        """
+        Returns the weighted stats of the chords added so far
+        """
+        if self.chord_count < 2:
+            raise ValueError("At least two chords are needed to calculate pattern stats.")
+
+        pattern_stats = self.pattern_sums.copy()
+
+        # This is gonnna be inaccurate but it's better than nothing
+        pattern_type = self.lookup_pattern_type(
+            self.prev_notes,
+            self.prev_mask,
+            self.last_notes,
+            self.last_mask,
+            DUMMY_CHORD,
+            DUMMY_CHORD_MASK,
+        )
         pattern_stats[pattern_type] += get_point_from_hold_note_time_diff(
-            time - prev_time
+            self.last_time - self.second_last_time
         )
 
-        prev_prev_notes = prev_notes
+        for pattern in pattern_stats:
+            if pattern == PatternType.OVERALL:
+                continue
+
+            pattern_stats[pattern] *= self.pattern_weights[pattern]
+            pattern_stats[pattern] /= self.chord_count
+
+        pattern_stats[PatternType.OVERALL] = sum(pattern_stats.values())
 
-        prev_notes = notes
-        prev_time = time
+        return pattern_stats
 
-    # This is gonnna be inaccurate but it's better than nothing
-    time, notes = list(hold_notes_dict.items())[-1]
-    prev_time = list(hold_notes_dict.keys())[-2]
 
-    pattern_type = get_pattern_type(prev_notes, notes, [3])  # Dummy note
-    pattern_stats[pattern_type] += get_point_from_hold_note_time_diff(time - prev_time)
+def calc_4k_hold_note_pattern_stats(
+    hold_notes_dict: dict[int, list[int]],
+) -> dict[PatternType, float]:
+    """
+    Calculates pattern stats for a 4k map.
+    """
+    accumulator = PatternStatsAccumulator(HOLD_NOTE_PATTERN_WEIGHTS)
 
-    for pattern in pattern_stats:
-        if pattern == PatternType.OVERALL:
-            continue
+    for time, notes in hold_notes_dict.items():
+        accumulator.add(time, notes)
 
-        pattern_stats[pattern] *= pattern_weights[pattern]
-        pattern_stats[pattern] /= line_count
+    return accumulator.get_pattern_stats()
 
-    pattern_stats[PatternType.OVERALL] = sum(pattern_stats.values())
 
-    return pattern_stats
+def calc_hold_note_pattern_stats(
+    hold_notes_dict: dict[int, list[int]], key_count: int
+) -> dict[PatternType, float]:
+    """
+    Calculates pattern stats for a map of any key mode, the same as
+    calc_4k_hold_note_pattern_stats for 4k maps.
+    """
+    accumulator = PatternStatsAccumulator(HOLD_NOTE_PATTERN_WEIGHTS, key_count)
+
+    for time, notes in hold_notes_dict.items():
+        accumulator.add(time, notes)
+
+    return accumulator.get_pattern_stats()
 
 
 def logistic(
@@ -293,54 +722,76 @@ def calc_4k_release_note_pattern_stats(
     """
     Basically uses the same algorithm that osu!lazor does
     """
-    pattern_stats = {pattern: 0.0 for pattern in PatternType}
-    pattern_weights: dict[PatternType, float] = {
-        PatternType.SINGLE_STREAM: 0.91,
-        PatternType.JUMP_STREAM: 1.92,
-        # lower then split trill since it may not be a trill.
-        PatternType.HAND_STREAM: 4.2,
-        PatternType.SPEED_JACK: 2.2,
-        PatternType.LIGHT_CHORD_JACK: 2.8,
-        PatternType.DENSE_CHORD_JACK: 5.3,
-        PatternType.JUMP_TRILL: 2.7,
-        PatternType.SPLIT_TRILL: 6,
-    }
+    accumulator = PatternStatsAccumulator(RELEASE_NOTE_PATTERN_WEIGHTS)
 
-    prev_notes = list(release_notes.values())[0]
-    prev_time = list(release_notes.keys())[0]
+    for time, notes in release_notes.items():
+        accumulator.add(time, notes)
 
-    prev_prev_notes = list(release_notes.values())[1]
+    return accumulator.get_pattern_stats()
 
-    line_count = len(release_notes)
 
-    for time, notes in list(release_notes.items())[2:]:
-        pattern_type = get_pattern_type(prev_prev_notes, prev_notes, notes)
-        pattern_stats[pattern_type] += get_point_from_hold_note_time_diff(
-            time - prev_time
-        )
-
-        prev_prev_notes = prev_notes
-
-        prev_notes = notes
-        prev_time = time
-
-    # This is gonnna be inaccurate but it's better than nothing
-    time, notes = list(release_notes.items())[-1]
-    prev_time = list(release_notes.keys())[-2]
+def iter_timeline(
+    hold_notes: dict[int, list[int]], release_notes: dict[int, list[int]]
+) -> Iterator[tuple[int, list[int], list[int]]]:
+    """
+    Yields (time, hold note indexes, release note indexes) of both dicts in time order,
+    one of the lists is empty if nothing happens on that side at the time.
+    """
+    hold_items = iter(hold_notes.items())
+    release_items = iter(release_notes.items())
+    hold_item = next(hold_items, None)
+    release_item = next(release_items, None)
+
+    while hold_item is not None or release_item is not None:
+        if release_item is None or (hold_item is not None and hold_item[0] < release_item[0]):
+            assert hold_item is not None
+            yield hold_item[0], hold_item[1], []
+            hold_item = next(hold_items, None)
+        elif hold_item is None or release_item[0] < hold_item[0]:
+            yield release_item[0], [], release_item[1]
+            release_item = next(release_items, None)
+        else:
+            yield hold_item[0], hold_item[1], release_item[1]
+            hold_item = next(hold_items, None)
+            release_item = next(release_items, None)
+
+
+def calc_4k_pattern_stats(
+    m: MainaMap,
+) -> tuple[dict[PatternType, float], dict[PatternType, float], dict[PatternType, float]]:
+    """
+    Returns (hold stats, release stats, merged stats) in one walk over the map.
+    The merged timeline has a chord at every time something is pressed or released
+    and uses the hold note weights.
+    Release stats are all 0 if the map has less than two release times.
+    """
+    hold_accumulator = PatternStatsAccumulator(HOLD_NOTE_PATTERN_WEIGHTS)
+    release_accumulator = PatternStatsAccumulator(RELEASE_NOTE_PATTERN_WEIGHTS)
+    merged_accumulator = PatternStatsAccumulator(HOLD_NOTE_PATTERN_WEIGHTS)
 
-    pattern_type = get_pattern_type(prev_notes, notes, [3])  # Dummy note
-    pattern_stats[pattern_type] += get_point_from_hold_note_time_diff(time - prev_time)
+    for time, hold_notes, release_notes in iter_timeline(
+        m.hold_notes_dict, m.release_notes_dict
+    ):
+        if hold_notes:
+            hold_accumulator.add(time, hold_notes)
 
-    for pattern in pattern_stats:
-        if pattern == PatternType.OVERALL:
-            continue
+        if release_notes:
+            release_accumulator.add(time, release_notes)
 
-        pattern_stats[pattern] *= pattern_weights[pattern]
-        pattern_stats[pattern] /= line_count
+        merged_accumulator.add(
+            time, hold_notes + [index for index in release_notes if index not in hold_notes]
+        )
 
-    pattern_stats[PatternType.OVERALL] = sum(pattern_stats.values())
+    if release_accumulator.chord_count < 2:
+        release_stats = {pattern: 0.0 for pattern in PatternType}
+    else:
+        release_stats = release_accumulator.get_pattern_stats()
 
-    return pattern_stats
+    return (
+        hold_accumulator.get_pattern_stats(),
+        release_stats,
+        merged_accumulator.get_pattern_stats(),
+    )
 
 
 def butify_pattern_stats(
@@ -357,16 +808,132 @@ def butify_pattern_stats(
     return result
 
 
-def from_file(file_path: str) -> dict[str, float]:
+def from_map(m: MainaMap, profiler: Profiler | None = None) -> dict[str, float]:
     """
-    Reads a osu! map file and returns the pattern stats in a butified format.
+    Returns the pattern stats of an already parsed map in a butified format.
     """
-    m = parse_map(file_path)
-    pattern_stats = calc_4k_hold_note_pattern_stats(m.hold_notes_dict)
+    if profiler is None:
+        pattern_stats = calc_hold_note_pattern_stats(m.hold_notes_dict, m.key_count)
+    else:
+        pattern_stats = calc_4k_hold_note_pattern_stats_profiled(m, profiler)
+
     butified_stats = butify_pattern_stats(pattern_stats)
     return butified_stats
 
 
+def calc_4k_hold_note_pattern_stats_profiled(
+    m: MainaMap, profiler: Profiler
+) -> dict[PatternType, float]:
+    """
+    Same as calc_4k_hold_note_pattern_stats, but the dict construction, the classification
+    and the scoring are run (and measured) one after another.
+    """
+    with profiler.stage("dicts"):
+        hold_notes_dict = m.hold_notes_dict
+
+    accumulator = PatternStatsAccumulator(HOLD_NOTE_PATTERN_WEIGHTS, m.key_count)
+
+    with profiler.stage("classify"):
+        rows = [accumulator.classify(time, notes) for time, notes in hold_notes_dict.items()]
+
+    with profiler.stage("score"):
+        for row in rows:
+            if row is not None:
+                accumulator.score(*row)
+
+        pattern_stats = accumulator.get_pattern_stats()
+
+    profiler.count("chords", len(hold_notes_dict))
+    profiler.count("rows", len(rows) - 1)
+
+    return pattern_stats
+
+
+@cache
+def get_snapshot_loader() -> Callable[[str], MainaMap | None] | None:
+    """
+    snapshot.load_snapshot, or None if numpy isn't installed (snapshots need it)
+    """
+    try:
+        from snapshot import load_snapshot  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+
+    return load_snapshot
+
+
+def load_map_snapshot(file_path: str) -> MainaMap | None:
+    """
+    The up-to-date snapshot of a map (see snapshot.py), None if there is none
+    """
+    load_snapshot = get_snapshot_loader()
+
+    return None if load_snapshot is None else load_snapshot(file_path)
+
+
+@cache
+def get_classification_digest() -> bytes:
+    """
+    Digest of the pattern table and the classification / scoring code,
+    computed once (hashing the pattern table takes milliseconds)
+    """
+    digest = hashlib.sha256()
+    digest.update(repr([p.name if p else None for p in PATTERN_TABLE]).encode())
+
+    for func in (get_point_from_hold_note_time_diff, get_pattern_type_from_masks):
+        digest.update(func.__code__.co_code)
+        digest.update(repr(func.__code__.co_consts).encode())
+
+    return digest.digest()
+
+
+def get_algorithm_version(include_weights: bool = True) -> str:
+    """
+    Changes whenever the pattern weights, the pattern table, the n-key classification
+    or the scoring function change, so stats cached by an older version are never reused.
+    Without include_weights, it only changes with what the unweighted stats depend on.
+    """
+    digest = hashlib.sha256()
+
+    if include_weights:
+        for pattern_weights in (HOLD_NOTE_PATTERN_WEIGHTS, RELEASE_NOTE_PATTERN_WEIGHTS):
+            digest.update(repr([(p.name, w) for p, w in pattern_weights.items()]).encode())
+
+    digest.update(get_classification_digest())
+
+    return digest.hexdigest()[:16]
+
+
+def from_file(
+    file_path: str,
+    result_cache: "ResultCache | None" = None,
+    profiler: Profiler | None = None,
+) -> dict[str, float]:
+    """
+    Reads a osu! map file and returns the pattern stats in a butified format.
+    With a result cache, a map which was already rated is not parsed again.
+    An up-to-date snapshot of the map (see snapshot.py) is loaded instead of parsing it.
+    With a profiler (or MAINA_PROFILE set), every stage is measured in profiler.get_report().
+    """
+    profiler = profiler or get_env_profiler()
+
+    if profiler is None:
+        if result_cache is not None:
+            return result_cache.rate_file(file_path)["stats"]
+
+        return from_map(load_map_snapshot(file_path) or parse_map(file_path))
+
+    with profiler.stage("total"):
+        if result_cache is not None:
+            with profiler.stage("cache"):
+                return result_cache.rate_file(file_path)["stats"]
+
+        with profiler.stage("snapshot"):
+            m = load_map_snapshot(file_path)
+
+        return from_map(m or parse_map(file_path, profiler), profiler)
+
+
 if __name__ == "__main__":
     print(json.dumps(from_file("test_files/delay.osu"), indent=4))
     print(get_chord_type([3, 4, 1]))
@@ -0,0 +1,188 @@
+"""
+This module stores the notes of a maina map as parallel numpy arrays
+instead of one Note object per note.
+"""
+
+from array import array
+from collections.abc import Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+from parse import HitObject, MainaMap, Note, stream_map
+
+# release_times value of a regular note
+NO_RELEASE = -1
+
+
+def get_chord_offsets(times: np.ndarray) -> np.ndarray:
+    """
+    The start of every chord of sorted times, followed by the number of times.
+    No times make no chord ([0]).
+    """
+    if len(times) == 0:
+        return np.zeros(1, dtype=np.int32)
+
+    return np.concatenate(
+        ([0], np.flatnonzero(np.diff(times)) + 1, [len(times)])
+    ).astype(np.int32)
+
+
+class ColumnarNotes:
+    """
+    Notes sorted by hold time (notes with the same hold time keep their order).
+    The notes of the i-th chord are in [chord_offsets[i], chord_offsets[i + 1]).
+    """
+
+    def __init__(
+        self,
+        columns: npt.ArrayLike,
+        hold_times: npt.ArrayLike,
+        release_times: npt.ArrayLike,
+    ) -> None:
+        hold_times = np.asarray(hold_times, dtype=np.int32)
+        order = np.argsort(hold_times, kind="stable")
+
+        self.columns = np.asarray(columns, dtype=np.int32)[order]
+        self.hold_times = hold_times[order]
+        self.release_times = np.asarray(release_times, dtype=np.int32)[order]
+        self.chord_offsets = get_chord_offsets(self.hold_times)
+
+    @classmethod
+    def from_sorted_arrays(
+        cls,
+        columns: np.ndarray,
+        hold_times: np.ndarray,
+        release_times: np.ndarray,
+        chord_offsets: np.ndarray,
+    ) -> "ColumnarNotes":
+        """
+        Wraps arrays which are already sorted and grouped (such as the arrays of a snapshot)
+        without copying them.
+        """
+        notes = cls.__new__(cls)
+        notes.columns = columns
+        notes.hold_times = hold_times
+        notes.release_times = release_times
+        notes.chord_offsets = chord_offsets
+
+        return notes
+
+    @classmethod
+    def from_hit_objects(cls, hit_objects: Iterable[HitObject]) -> "ColumnarNotes":
+        """
+        Packs hit objects (see parse.iter_hit_objects) without creating Note objects.
+        """
+        columns = array("i")
+        hold_times = array("i")
+        release_times = array("i")
+
+        for index, hold_time, release_time in hit_objects:
+            columns.append(index)
+            hold_times.append(hold_time)
+            release_times.append(NO_RELEASE if release_time is None else release_time)
+
+        return cls(columns, hold_times, release_times)
+
+    @classmethod
+    def from_notes(cls, notes: Iterable[Note]) -> "ColumnarNotes":
+        """
+        Packs already created Note objects
+        """
+        return cls.from_hit_objects(
+            (note.index, note.hold_time, note.release_time) for note in notes
+        )
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    @property
+    def chord_count(self) -> int:
+        """
+        The number of distinct hold times
+        """
+        return len(self.chord_offsets) - 1
+
+    @property
+    def chord_times(self) -> np.ndarray:
+        """
+        The hold time of each chord
+        """
+        return self.hold_times[self.chord_offsets[:-1]]
+
+    def to_notes(self) -> list[Note]:
+        """
+        Creates Note objects, only for the code which still needs them.
+        """
+        return [
+            Note(index, hold_time, None if release_time == NO_RELEASE else release_time)
+            for index, hold_time, release_time in zip(
+                self.columns.tolist(),
+                self.hold_times.tolist(),
+                self.release_times.tolist(),
+            )
+        ]
+
+    def get_hold_notes_dict(self) -> dict[int, list[int]]:
+        """
+        Same as MainaMap.hold_notes_dict
+        """
+        return _group_by_time(self.hold_times, self.columns, self.chord_offsets)
+
+    def get_release_notes_dict(self) -> dict[int, list[int]]:
+        """
+        Same as MainaMap.release_notes_dict
+        """
+        return _group_by_time(*self.get_release_chords())
+
+    def get_long_notes(self) -> list[HitObject]:
+        """
+        (index, hold_time, release_time) of every long note
+        """
+        is_ln = self.release_times != NO_RELEASE
+
+        return list(
+            zip(
+                self.columns[is_ln].tolist(),
+                self.hold_times[is_ln].tolist(),
+                self.release_times[is_ln].tolist(),
+            )
+        )
+
+    def get_release_chords(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (release_times, columns, chord_offsets) of the long notes sorted by release time,
+        the same layout as (hold_times, columns, chord_offsets)
+        """
+        is_ln = self.release_times != NO_RELEASE
+        order = np.argsort(self.release_times[is_ln], kind="stable")
+        release_times = self.release_times[is_ln][order]
+        columns = self.columns[is_ln][order]
+        offsets = get_chord_offsets(release_times)
+
+        return release_times, columns, offsets
+
+
+def _group_by_time(
+    times: np.ndarray, columns: np.ndarray, offsets: np.ndarray
+) -> dict[int, list[int]]:
+    column_list = columns.tolist()
+    time_list = times.tolist()
+    offset_list = offsets.tolist()
+
+    return {
+        time_list[start]: column_list[start:end]
+        for start, end in zip(offset_list[:-1], offset_list[1:])
+        if start != end
+    }
+
+
+def parse_columnar_map(path: str) -> MainaMap:
+    """
+    Same as parse.parse_map but the map is backed by a ColumnarNotes.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        key_count, hit_objects = stream_map(file)
+        columns = ColumnarNotes.from_hit_objects(hit_objects)
+
+    return MainaMap.from_columns(key_count, columns)
@@ -0,0 +1,111 @@
+"""
+Shared fixtures of the tests.
+Every map in test_files is parsed once per session with parse.parse_map, on a process pool,
+and the parsed maps are kept in the pytest cache until a map or the parser changes.
+"""
+
+import os
+import pickle
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import columnar
+import map_files
+import parse
+from columnar import ColumnarNotes
+from parse import MainaMap, parse_map
+
+TEST_FILES = "test_files"
+
+
+def normalize_path(path: str) -> str:
+    """
+    test_files/a.osu, ./test_files/a.osu and test_files\\a.osu are the same map
+    """
+    return os.path.normpath(path.replace("\\", "/"))
+
+
+def load_columns(path: str) -> tuple[int, ColumnarNotes]:
+    """
+    Runs in a worker process, arrays are much cheaper to send back than Note objects
+    """
+    m = parse_map(path)
+
+    return m.key_count, ColumnarNotes.from_notes(m.notes)
+
+
+def to_map(key_count: int, columns: ColumnarNotes) -> MainaMap:
+    """
+    The map as parse_map returns it, its dicts are built from the notes
+    """
+    return MainaMap(key_count, columns.to_notes())
+
+
+class Corpus:
+    """
+    The parsed maps of test_files by path
+    """
+
+    def __init__(self, maps: dict[str, MainaMap]) -> None:
+        self.maps = maps
+
+    def __getitem__(self, path: str) -> MainaMap:
+        return self.maps[normalize_path(path)]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.maps)
+
+    def __len__(self) -> int:
+        return len(self.maps)
+
+
+def get_corpus_key(paths: list[str]) -> list[tuple[str, int, int]]:
+    """
+    Changes whenever a map or the parser changes
+    """
+    return [
+        (path, os.stat(path).st_mtime_ns, os.stat(path).st_size)
+        for path in paths + [parse.__file__, columnar.__file__]
+    ]
+
+
+def load_corpus(cache_dir: str | None = None, workers: int | None = None) -> Corpus:
+    """
+    Parses every map of test_files in parallel, or loads them from cache_dir
+    """
+    paths = [normalize_path(path) for path in map_files.find_map_files([TEST_FILES])]
+    key = get_corpus_key(paths)
+    cache_path = os.path.join(cache_dir, "corpus.pickle") if cache_dir else None
+
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, "rb") as file:
+            cached_key, columns = pickle.load(file)
+
+        if cached_key == key:
+            return Corpus({path: to_map(*columns[path]) for path in paths})
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        columns = dict(zip(paths, executor.map(load_columns, paths, chunksize=4)))
+
+    if cache_path is not None:
+        with open(cache_path, "wb") as file:
+            pickle.dump((key, columns), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return Corpus({path: to_map(*columns[path]) for path in paths})
+
+
+@pytest.fixture(scope="session")
+def corpus(pytestconfig: pytest.Config) -> Corpus:
+    """
+    Every map of test_files, parsed once per session.
+    The maps are shared by the tests, don't modify them.
+    Without the cache plugin (-p no:cacheprovider), the maps are parsed every session.
+    """
+    cache = getattr(pytestconfig, "cache", None)
+
+    if cache is None:
+        return load_corpus()
+
+    return load_corpus(str(cache.mkdir("maina_corpus")))
@@ -0,0 +1,314 @@
+"""
+This module keeps an index of a map corpus in a sqlite database:
+the metadata and the stats of every pattern of each map, so maps can be searched
+without rating them on demand.
+
+python corpus.py index songs/ "packs/**/*.osu" --db corpus.sqlite3
+python corpus.py top SPLIT_TRILL --min 20 --max 30 --limit 50 --db corpus.sqlite3
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from collections.abc import Iterable
+from typing import Any
+
+import batch
+import calc
+import map_files
+from calc import PatternType
+from parse import parse_map, scan_header
+
+DEFAULT_INDEX_PATH = "corpus.sqlite3"
+
+PATTERN_COLUMNS = [pattern.name for pattern in PatternType]
+METADATA_COLUMNS = ["path", "mtime", "size", "hash", "version", "title", "difficulty", "key_count"]
+
+
+def get_file_hash(path: str) -> str:
+    """
+    sha256 of the content of a file
+    """
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def read_map_file(path: str) -> tuple[dict[str, Any], bytes]:
+    """
+    Reads a map once, returns ({"mtime", "size", "hash", "title", "difficulty", "key_count"}
+    of the file, its content)
+    """
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        data = file.read()
+
+    header = scan_header(data)
+    file_info = {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "hash": hashlib.sha256(data).hexdigest(),
+        "title": header.title,
+        "difficulty": header.version,
+        "key_count": header.key_count,
+    }
+
+    return file_info, data
+
+
+def rate_corpus_file(path: str) -> dict[str, Any]:
+    """
+    Same as batch.rate_file, with the "file" info of read_map_file,
+    so the map is read only once. A file which can't be read has no "file".
+    """
+    try:
+        file_info, data = read_map_file(path)
+    except (OSError, ValueError) as e:
+        return {"path": path, "error": {"type": type(e).__name__, "message": str(e)}}
+
+    try:
+        m = parse_map(data)
+        result = {"path": path, "key_count": m.key_count, "stats": calc.from_map(m)}
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        result = {"path": path, "error": {"type": type(e).__name__, "message": str(e)}}
+
+    result["file"] = file_info
+
+    return result
+
+
+class CorpusIndex:
+    """
+    One row per map, with a column per PatternType.
+    A map is only rated again when its content or the algorithm version changed.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH) -> None:
+        self.version = calc.get_algorithm_version()
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS maps ("
+            "path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL, "
+            "hash TEXT NOT NULL, version TEXT NOT NULL, "
+            "title TEXT, difficulty TEXT, key_count INTEGER, error TEXT, "
+            + ", ".join(f"{name} REAL" for name in PATTERN_COLUMNS)
+            + ")"
+        )
+
+        for name in PATTERN_COLUMNS:
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS maps_{name} ON maps ({name})")
+
+    def __enter__(self) -> "CorpusIndex":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the database
+        """
+        self.connection.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM maps").fetchone()[0]
+
+    def get_stale_paths(self, paths: Iterable[str]) -> tuple[list[str], list[str]]:
+        """
+        Returns (paths which have to be rated, paths whose file was only touched).
+        A file with the same mtime and size is not read,
+        a file with a new mtime is only rated again if its hash changed.
+        """
+        stale_paths: list[str] = []
+        touched_paths: list[str] = []
+
+        for path in paths:
+            row = self.connection.execute(
+                "SELECT mtime, size, hash, version FROM maps WHERE path = ?", (path,)
+            ).fetchone()
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stale_paths.append(path)
+                continue
+
+            if row is None or row[3] != self.version:
+                stale_paths.append(path)
+            elif (row[0], row[1]) != (stat.st_mtime, stat.st_size):
+                if get_file_hash(path) == row[2]:
+                    touched_paths.append(path)
+                else:
+                    stale_paths.append(path)
+
+        return stale_paths, touched_paths
+
+    def update(self, paths: Iterable[str], workers: int | None = None) -> dict[str, int]:
+        """
+        Rates the new and changed maps on a process pool and stores them.
+        Returns the number of "rated", "touched" (same content, new mtime),
+        "unchanged" and "errors" maps.
+        """
+        paths = list(paths)
+        stale_paths, touched_paths = self.get_stale_paths(paths)
+        counts = {
+            "rated": 0,
+            "touched": len(touched_paths),
+            "unchanged": len(paths) - len(stale_paths) - len(touched_paths),
+            "errors": 0,
+        }
+
+        with self.connection:
+            for path in touched_paths:
+                stat = os.stat(path)
+                self.connection.execute(
+                    "UPDATE maps SET mtime = ?, size = ? WHERE path = ?",
+                    (stat.st_mtime, stat.st_size, path),
+                )
+
+        for result in batch.rate_on_pool(rate_corpus_file, stale_paths, workers):
+            with self.connection:
+                if self.put(result):
+                    counts["rated"] += 1
+                else:
+                    counts["errors"] += 1
+
+        return counts
+
+    def put(self, result: dict[str, Any]) -> bool:
+        """
+        Stores a result of rate_corpus_file (or batch.rate_file, the file is then read again),
+        returns False if the map couldn't be rated.
+        Maps which can't be read at all are not stored.
+        """
+        path = result["path"]
+
+        try:
+            file_info = result["file"] if "file" in result else read_map_file(path)[0]
+        except (OSError, ValueError):
+            self.remove(path)
+            return False
+
+        error = json.dumps(result["error"]) if "error" in result else None
+        row = {"path": path, "version": self.version, "error": error, **file_info}
+        row.update(result.get("stats", {}))
+        columns = METADATA_COLUMNS + ["error"] + PATTERN_COLUMNS
+
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO maps ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            [row.get(name) for name in columns],
+        )
+
+        return error is None
+
+    def remove(self, path: str) -> None:
+        """
+        Removes a map from the index (nothing happens if it isn't in it)
+        """
+        self.connection.execute("DELETE FROM maps WHERE path = ?", (path,))
+
+    def prune(self) -> int:
+        """
+        Removes the maps whose file no longer exists, returns how many were removed
+        """
+        missing = [
+            (path,)
+            for (path,) in self.connection.execute("SELECT path FROM maps").fetchall()
+            if not os.path.exists(path)
+        ]
+
+        with self.connection:
+            self.connection.executemany("DELETE FROM maps WHERE path = ?", missing)
+
+        return len(missing)
+
+    def get(self, path: str) -> dict[str, Any] | None:
+        """
+        The row of a map as a dict, or None
+        """
+        rows = self.__fetch_dicts("SELECT * FROM maps WHERE path = ?", [path])
+
+        return rows[0] if rows else None
+
+    def top(
+        self,
+        pattern: PatternType,
+        limit: int = 50,
+        overall_range: tuple[float | None, float | None] = (None, None),
+        key_count: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        The maps with the highest stat of a pattern, optionally with OVERALL in
+        [min, max] (either bound can be None) and of a key count
+        """
+        conditions = [f"{pattern.name} IS NOT NULL"]
+        parameters: list[Any] = []
+
+        if overall_range[0] is not None:
+            conditions.append("OVERALL >= ?")
+            parameters.append(overall_range[0])
+
+        if overall_range[1] is not None:
+            conditions.append("OVERALL <= ?")
+            parameters.append(overall_range[1])
+
+        if key_count is not None:
+            conditions.append("key_count = ?")
+            parameters.append(key_count)
+
+        return self.__fetch_dicts(
+            f"SELECT path, title, difficulty, key_count, {', '.join(PATTERN_COLUMNS)} FROM maps "
+            f"WHERE {' AND '.join(conditions)} ORDER BY {pattern.name} DESC LIMIT ?",
+            parameters + [limit],
+        )
+
+    def __fetch_dicts(self, query: str, parameters: list[Any]) -> list[dict[str, Any]]:
+        cursor = self.connection.execute(query, parameters)
+        names = [description[0] for description in cursor.description]
+
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Entry point of the command line
+    """
+    parser = argparse.ArgumentParser(description="Indexes and searches the stats of a map corpus.")
+    parser.add_argument("--db", default=DEFAULT_INDEX_PATH, help="sqlite file of the index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="rates the new and changed maps")
+    index_parser.add_argument("paths", nargs="+", help="files, directories, globs or path lists")
+    index_parser.add_argument("--workers", type=int, default=None)
+    index_parser.add_argument("--prune", action="store_true", help="removes deleted maps")
+
+    top_parser = subparsers.add_parser("top", help="prints the maps with the highest stat")
+    top_parser.add_argument("pattern", choices=PATTERN_COLUMNS)
+    top_parser.add_argument("--limit", type=int, default=50)
+    top_parser.add_argument("--min", type=float, default=None, help="lowest OVERALL")
+    top_parser.add_argument("--max", type=float, default=None, help="highest OVERALL")
+    top_parser.add_argument("--keys", type=int, default=None)
+
+    args = parser.parse_args(argv)
+
+    with CorpusIndex(args.db) as index:
+        if args.command == "index":
+            counts = index.update(map_files.find_map_files(args.paths), args.workers)
+
+            if args.prune:
+                counts["pruned"] = index.prune()
+
+            print(json.dumps(counts))
+            return
+
+        for row in index.top(
+            PatternType[args.pattern], args.limit, (args.min, args.max), args.keys
+        ):
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+This module keeps the pattern stats of a map up to date while it is edited.
+An edit at a chord only changes the rows which contain that chord,
+so only those rows are classified and scored again.
+"""
+# pylint: disable=too-many-instance-attributes
+
+from bisect import bisect_left, insort
+
+from calc import (
+    DUMMY_CHORD,
+    DUMMY_CHORD_MASK,
+    HOLD_NOTE_PATTERN_WEIGHTS,
+    PatternType,
+    get_pattern_lookup,
+    get_point_from_hold_note_time_diff,
+)
+from parse import MainaMap
+
+# The rows of the first chords are special (see calc.PatternStatsAccumulator),
+# so they are always updated by an edit before this position
+FIRST_ROWS_END = 5
+
+
+class IncrementalRater:
+    """
+    Same stats as calc.calc_hold_note_pattern_stats(m.hold_notes_dict, m.key_count),
+    updated in place by add_note and remove_note.
+    The map itself isn't edited, the rater keeps its own chords.
+    """
+
+    def __init__(
+        self, m: MainaMap, pattern_weights: dict[PatternType, float] | None = None
+    ) -> None:
+        self.key_count = m.key_count
+        self.pattern_weights = pattern_weights or HOLD_NOTE_PATTERN_WEIGHTS
+        self.get_mask, self.lookup_pattern_type = get_pattern_lookup(m.key_count)
+
+        self.times = list(m.hold_notes_dict)
+        self.chords = {time: list(notes) for time, notes in m.hold_notes_dict.items()}
+        self.masks = {time: self.get_mask(notes) for time, notes in self.chords.items()}
+
+        # dict[time of the last chord of a row, (pattern type, point)]
+        self.rows: dict[int, tuple[PatternType, float]] = {}
+        self.pattern_sums = {pattern: 0.0 for pattern in PatternType}
+
+        for position in range(2, len(self.times)):
+            self.__update_row(position)
+
+    def add_note(self, index: int, hold_time: int) -> None:
+        """
+        Adds a note on the column at the time and updates the rows around it
+        """
+        if hold_time in self.chords:
+            self.chords[hold_time].append(index)
+        else:
+            insort(self.times, hold_time)
+            self.chords[hold_time] = [index]
+
+        self.masks[hold_time] = self.get_mask(self.chords[hold_time])
+        self.__update_rows_around(bisect_left(self.times, hold_time))
+
+    def remove_note(self, index: int, hold_time: int) -> None:
+        """
+        Removes the note on the column at the time and updates the rows around it
+        """
+        if index not in self.chords.get(hold_time, []):
+            raise ValueError(f"No note on column {index} at {hold_time}.")
+
+        position = bisect_left(self.times, hold_time)
+        self.chords[hold_time].remove(index)
+
+        if self.chords[hold_time]:
+            self.masks[hold_time] = self.get_mask(self.chords[hold_time])
+        else:
+            del self.times[position]
+            del self.chords[hold_time]
+            del self.masks[hold_time]
+            self.__remove_row(hold_time)
+
+        self.__update_rows_around(position)
+
+    def get_hold_notes_dict(self) -> dict[int, list[int]]:
+        """
+        dict[time, index] (sorted) of the map as it is now
+        """
+        return {time: list(self.chords[time]) for time in self.times}
+
+    def get_pattern_stats(self) -> dict[PatternType, float]:
+        """
+        The stats of the map as it is now
+        """
+        if len(self.times) < 2:
+            raise ValueError("At least two chords are needed to calculate pattern stats.")
+
+        pattern_stats = self.pattern_sums.copy()
+
+        last = self.times[-1]
+        prev = last if len(self.times) > 2 else self.times[0]
+        pattern_type = self.lookup_pattern_type(
+            self.chords[prev],
+            self.masks[prev],
+            self.chords[last],
+            self.masks[last],
+            DUMMY_CHORD,
+            DUMMY_CHORD_MASK,
+        )
+        pattern_stats[pattern_type] += get_point_from_hold_note_time_diff(last - self.times[-2])
+
+        for pattern in pattern_stats:
+            if pattern == PatternType.OVERALL:
+                continue
+
+            pattern_stats[pattern] *= self.pattern_weights[pattern]
+            pattern_stats[pattern] /= len(self.times)
+
+        pattern_stats[PatternType.OVERALL] = sum(pattern_stats.values())
+
+        return pattern_stats
+
+    def __update_rows_around(self, position: int) -> None:
+        # An edited chord is in the rows at position, position + 1 and position + 2
+        start, end = position, position + 3
+
+        if position < FIRST_ROWS_END:
+            start, end = 0, max(end, FIRST_ROWS_END)
+
+        for i in range(start, min(end, len(self.times))):
+            if i < 2:
+                self.__remove_row(self.times[i])
+            else:
+                self.__update_row(i)
+
+    def __update_row(self, position: int) -> None:
+        times = self.times
+        time = times[position]
+
+        if position == 2:
+            # The first two chords are swapped, the same as calc.PatternStatsAccumulator
+            prev_prev, prev, time_diff = times[1], times[0], time - times[0]
+        elif position == 3:
+            prev_prev, prev, time_diff = times[0], times[2], time - times[2]
+        else:
+            prev_prev, prev = times[position - 2], times[position - 1]
+            time_diff = time - prev
+
+        pattern_type = self.lookup_pattern_type(
+            self.chords[prev_prev],
+            self.masks[prev_prev],
+            self.chords[prev],
+            self.masks[prev],
+            self.chords[time],
+            self.masks[time],
+        )
+
+        self.__remove_row(time)
+        self.rows[time] = (pattern_type, get_point_from_hold_note_time_diff(time_diff))
+        self.pattern_sums[pattern_type] += self.rows[time][1]
+
+    def __remove_row(self, time: int) -> None:
+        row = self.rows.pop(time, None)
+
+        if row is not None:
+            self.pattern_sums[row[0]] -= row[1]
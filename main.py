@@ -1,16 +1,208 @@
 """
 This moudule gets a file name from the command line,
 and prints the pattern stats of a osu maina map in a JSON format.
+
+With --batch, it takes .osu files, directories, glob patterns or files listing paths,
+rates them on a process pool and prints one JSON line (NDJSON) per map.
+
+With --stdin, it reads paths (one per line) or the content of .osu files from stdin
+and prints one compact JSON line per map as soon as it is rated:
+find songs -name "*.osu" | python main.py --stdin
 """
 
-import sys
+import argparse
 import json
+import os
+import sys
+from collections.abc import Iterable, Iterator
+from functools import partial
+from typing import Any
+
+from profiling import Profiler
 
+import batch
 import calc
+import map_files
+from cache import ResultCache
+from parse import parse_lines
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python main.py <path_to_osu_file>")
-        sys.exit(1)
+# The first line of every .osu file, a line starting with it on stdin starts a new map
+OSU_FILE_HEADER = "osu file format"
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    """
+    Command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Prints the pattern stats of osu maina maps in a JSON format."
+    )
+    parser.add_argument("paths", nargs="*", help="path to an .osu file")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="rate every map in the paths (files, directories, globs or path lists) as NDJSON",
+    )
+    parser.add_argument(
+        "--stdin",
+        action="store_true",
+        help="read paths or .osu contents from stdin and print compact NDJSON",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes in batch mode (default: number of cores)",
+    )
+    parser.add_argument(
+        "--keys",
+        type=int,
+        default=None,
+        help="in batch mode, only rate maina maps of this key count (read from the headers)",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="PATH",
+        default=None,
+        help="sqlite file caching the stats of maps which were already rated",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="prints the time of each stage to stderr",
+    )
+    parser.add_argument(
+        "--profile-alloc",
+        action="store_true",
+        help="same as --profile, with the allocations of each stage",
+    )
+
+    return parser
+
+
+def iter_stdin_maps(lines: Iterable[str]) -> Iterator[tuple[str, str | list[str]]]:
+    """
+    Yields ("path", path) for every path, or ("map", lines of a map) for every .osu content.
+    Once an .osu content is found, every following line belongs to a map.
+    """
+    map_lines: list[str] | None = None
+
+    for line in lines:
+        if line.lstrip("\ufeff").startswith(OSU_FILE_HEADER):
+            if map_lines is not None:
+                yield "map", map_lines
+
+            map_lines = [line]
+        elif map_lines is not None:
+            map_lines.append(line)
+        elif line.strip():
+            yield "path", line.strip()
+
+    if map_lines is not None:
+        yield "map", map_lines
+
+
+def rate_stdin_item(
+    item: tuple[int, str, str | list[str]], cache_path: str | None = None
+) -> dict[str, Any]:
+    """
+    Rates an (index, kind, value) item of iter_stdin_maps (index : position in stdin).
+    A path gives the result of batch.rate_file, a map read from stdin gives
+    {"index", "key_count", "stats"} or {"index", "error": {"type", "message"}}.
+    """
+    index, _, value = item
+
+    if isinstance(value, str):
+        return batch.rate_file(value, cache_path)
+
+    try:
+        m = parse_lines(value)
+
+        return {"index": index, "key_count": m.key_count, "stats": calc.from_map(m)}
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return {"index": index, "error": {"type": type(e).__name__, "message": str(e)}}
 
-    print(json.dumps(calc.from_file(sys.argv[1]), indent=4))
+
+def rate_stdin(
+    lines: Iterable[str], workers: int | None = None, cache_path: str | None = None
+) -> Iterator[dict[str, Any]]:
+    """
+    Rates the maps of stdin one at a time in this process, in the order of stdin.
+    With workers, they are rated on a process pool and yielded as they finish.
+    """
+    items = ((index, kind, value) for index, (kind, value) in enumerate(iter_stdin_maps(lines)))
+
+    if workers is not None:
+        yield from batch.rate_on_pool(
+            partial(rate_stdin_item, cache_path=cache_path),
+            items,
+            workers,
+            None if cache_path is None else batch.open_cache,
+            () if cache_path is None else (cache_path,),
+        )
+        return
+
+    for item in items:
+        yield rate_stdin_item(item, cache_path)
+
+
+def print_ndjson(results: Iterable[dict[str, Any]]) -> None:
+    """
+    Prints one compact JSON line per result, flushed right away so the next tool
+    of a pipeline gets it immediately (and a full pipe slows the rating down).
+    Stops quietly if the reader closes the pipe.
+    """
+    try:
+        for result in results:
+            sys.stdout.write(json.dumps(result, separators=(",", ":")) + "\n")
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # Python would also fail to flush stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Entry point of the command line
+    """
+    parser = get_arg_parser()
+    args = parser.parse_args(argv)
+
+    if args.stdin:
+        if args.paths or args.batch:
+            parser.error("--stdin takes no paths and can't be used with --batch")
+
+        print_ndjson(rate_stdin(sys.stdin, args.workers, args.cache))
+        return
+
+    if not args.batch:
+        if len(args.paths) != 1:
+            parser.error("exactly one path is needed without --batch")
+
+        profiler = None
+
+        if args.profile or args.profile_alloc:
+            profiler = Profiler(trace_allocations=args.profile_alloc)
+
+        if args.cache is None:
+            print(json.dumps(calc.from_file(args.paths[0], profiler=profiler), indent=4))
+        else:
+            with ResultCache(args.cache) as cache:
+                print(json.dumps(calc.from_file(args.paths[0], cache, profiler), indent=4))
+
+        if profiler is not None:
+            print(json.dumps(profiler.get_report(), indent=4), file=sys.stderr)
+        return
+
+    paths = map_files.find_map_files(args.paths)
+
+    if args.keys is not None:
+        paths = map_files.filter_map_files(paths, args.keys)
+
+    for result in batch.rate_files(paths, args.workers, args.cache):
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
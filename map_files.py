@@ -0,0 +1,80 @@
+"""
+This module expands the paths given on the command line
+(.osu files, directories, glob patterns and path lists) into the .osu files to rate.
+"""
+
+import glob
+import os
+from collections.abc import Iterable, Iterator
+
+from parse import scan_header
+
+
+def is_map_file(path: str) -> bool:
+    """
+    True for .osu files (whatever the case of the extension)
+    """
+    return path.lower().endswith(".osu")
+
+
+def read_path_list(path: str) -> list[str] | None:
+    """
+    The paths (one per line) of a text file, None if it can't be read as text
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return [line.strip() for line in file if line.strip()]
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def find_directory_map_files(path: str) -> list[str]:
+    """
+    The .osu files of a directory and its subdirectories
+    """
+    return sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(path)
+        for name in names
+        if is_map_file(name)
+    )
+
+
+def find_map_files(paths: Iterable[str]) -> Iterator[str]:
+    """
+    Expands the paths into .osu files.
+    A path can be a .osu file, a directory (searched recursively), a glob pattern
+    (only the directories and .osu files it matches are kept) or any other file,
+    which is read as a list of paths (one per line).
+    A path which can't be read is yielded as is, so batch.rate_file reports its error.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from find_directory_map_files(path)
+        elif glob.has_magic(path):
+            for match in sorted(glob.glob(path, recursive=True)):
+                if os.path.isdir(match):
+                    yield from find_directory_map_files(match)
+                elif is_map_file(match):
+                    yield match
+        elif is_map_file(path):
+            yield path
+        else:
+            listed_paths = read_path_list(path)
+            yield from [path] if listed_paths is None else find_map_files(listed_paths)
+
+
+def filter_map_files(paths: Iterable[str], key_count: int | None = None) -> Iterator[str]:
+    """
+    Keeps the maina maps (of key_count keys if given) by reading only their headers.
+    Maps which can't be read are kept, so batch.rate_file reports their error.
+    """
+    for path in paths:
+        try:
+            header = scan_header(path)
+        except (OSError, ValueError):
+            yield path
+            continue
+
+        if header.is_mania() and key_count in (None, header.key_count):
+            yield path
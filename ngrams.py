@@ -0,0 +1,153 @@
+"""
+This module counts the motifs of a map: the sequences of n chords (n-grams of chord masks)
+which occur the most, for several n in one pass over the map.
+
+python ngrams.py map.osu --lengths 4 8 --top 10
+"""
+
+import argparse
+import json
+from collections.abc import Iterable
+
+from calc import get_column_mask
+from parse import parse_map
+
+DEFAULT_LENGTHS = range(4, 9)
+
+# Distinct motifs kept per length, the counts are exact below this
+DEFAULT_MAX_MOTIFS = 4096
+
+
+class BoundedCounter:
+    """
+    Counts keys in at most capacity entries (Misra-Gries summary).
+    The counts are exact while there are less distinct keys than capacity,
+    otherwise a count is lower than the true one by at most error.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.error = 0
+
+    def add(self, key: int) -> None:
+        """
+        Counts a key once
+        """
+        self.total += 1
+        counts = self.counts
+
+        if key in counts:
+            counts[key] += 1
+        elif len(counts) < self.capacity:
+            counts[key] = 1
+        else:
+            # The new key and one occurrence of every kept key cancel out
+            self.counts = {kept: count - 1 for kept, count in counts.items() if count > 1}
+            self.error += 1
+
+    def most_common(self, count: int) -> list[tuple[int, int]]:
+        """
+        (key, count) of the most frequent keys
+        """
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+class NgramHistogram:
+    """
+    A BoundedCounter of the n-grams of each length.
+    An n-gram is stored as the masks of its chords packed into one integer,
+    key_count bits per chord with the first chord in the highest bits.
+    """
+
+    def __init__(self, key_count: int, lengths: Iterable[int], max_motifs: int) -> None:
+        self.key_count = key_count
+        self.counters = {n: BoundedCounter(max_motifs) for n in sorted(set(lengths))}
+
+        if not self.counters or min(self.counters) < 1:
+            raise ValueError("n-gram lengths must be positive.")
+
+    def get_motif(self, key: int, n: int) -> list[int]:
+        """
+        The chord masks of a packed n-gram
+        """
+        chord_bits = (1 << self.key_count) - 1
+
+        return [(key >> (self.key_count * (n - 1 - i))) & chord_bits for i in range(n)]
+
+    def format_motif(self, key: int, n: int) -> str:
+        """
+        A packed n-gram as chords separated by spaces (#x#x : columns 0 and 2)
+        """
+        return " ".join(
+            "".join("#" if mask & (1 << index) else "x" for index in range(self.key_count))
+            for mask in self.get_motif(key, n)
+        )
+
+    def get_top(self, n: int, count: int = 10) -> list[dict[str, object]]:
+        """
+        The most frequent motifs of length n with their count and their density
+        (ratio of the n-grams of the map which are that motif)
+        """
+        counter = self.counters[n]
+
+        return [
+            {
+                "motif": self.format_motif(key, n),
+                "count": motif_count,
+                "density": motif_count / counter.total,
+            }
+            for key, motif_count in counter.most_common(count)
+        ]
+
+    def get_summary(self, count: int = 10) -> dict[int, list[dict[str, object]]]:
+        """
+        get_top of every length
+        """
+        return {n: self.get_top(n, count) for n in self.counters}
+
+
+def calc_ngram_histogram(
+    hold_notes_dict: dict[int, list[int]],
+    key_count: int,
+    lengths: Iterable[int] = DEFAULT_LENGTHS,
+    max_motifs: int = DEFAULT_MAX_MOTIFS,
+) -> NgramHistogram:
+    """
+    Counts the chord n-grams of every length in one pass.
+    A rolling integer holds the masks of the last max(lengths) chords,
+    the n-gram ending at each chord is its lowest n * key_count bits.
+    """
+    histogram = NgramHistogram(key_count, lengths, max_motifs)
+    counters = [
+        (n, (1 << (key_count * n)) - 1, counter) for n, counter in histogram.counters.items()
+    ]
+    window_bits = (1 << (key_count * max(histogram.counters))) - 1
+    window = 0
+
+    for chord_count, notes in enumerate(hold_notes_dict.values(), 1):
+        window = ((window << key_count) | get_column_mask(notes)) & window_bits
+
+        for n, ngram_bits, counter in counters:
+            if chord_count >= n:
+                counter.add(window & ngram_bits)
+
+    return histogram
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Prints the most frequent chord motifs of a map."
+    )
+    arg_parser.add_argument("path", help="path to an .osu file")
+    arg_parser.add_argument("--lengths", type=int, nargs=2, default=[4, 8], metavar=("MIN", "MAX"))
+    arg_parser.add_argument("--top", type=int, default=10)
+    arg_parser.add_argument("--max-motifs", type=int, default=DEFAULT_MAX_MOTIFS)
+    args = arg_parser.parse_args()
+
+    m = parse_map(args.path)
+    ngram_histogram = calc_ngram_histogram(
+        m.hold_notes_dict, m.key_count, range(args.lengths[0], args.lengths[1] + 1), args.max_motifs
+    )
+    print(json.dumps(ngram_histogram.get_summary(args.top), indent=4))
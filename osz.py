@@ -0,0 +1,79 @@
+"""
+This module reads the difficulties of an .osz beatmap set (a zip file)
+straight from the archive, without extracting it to disk.
+Difficulties of other modes than maina are skipped after their [General] section.
+"""
+
+import io
+import zipfile
+from collections.abc import Iterator
+from typing import IO, Any
+
+import calc
+from parse import MANIA_MODE, MainaMap, open_text, parse_lines, read_mode
+
+OSU_EXTENSION = ".osu"
+
+
+def read_osz_entry(
+    archive: zipfile.ZipFile, name: str, mania_only: bool = True
+) -> MainaMap | None:
+    """
+    Parses an .osu entry of the archive, or returns None if it isn't a maina map
+    """
+    with archive.open(name) as entry, open_text(entry) as file:
+        mode, lines = read_mode(iter(file))
+
+        if mania_only and mode != MANIA_MODE:
+            return None
+
+        return parse_lines(lines)
+
+
+def get_osu_entries(archive: zipfile.ZipFile) -> list[str]:
+    """
+    Names of the .osu entries of the archive
+    """
+    return [name for name in archive.namelist() if name.lower().endswith(OSU_EXTENSION)]
+
+
+def iter_osz_maps(
+    source: str | bytes | IO[bytes], mania_only: bool = True
+) -> Iterator[tuple[str, MainaMap]]:
+    """
+    Yields (entry name, map) of every difficulty of an .osz
+    source : a path, the content of the archive or a binary file object
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    with zipfile.ZipFile(source) as archive:
+        for name in get_osu_entries(archive):
+            m = read_osz_entry(archive, name, mania_only)
+
+            if m is not None:
+                yield name, m
+
+
+def rate_osz(source: str | bytes | IO[bytes]) -> Iterator[dict[str, Any]]:
+    """
+    Yields {"path", "key_count", "stats"} of every maina difficulty of an .osz,
+    or {"path", "error": {"type", "message"}} if it can't be rated (same as batch.rate_file).
+    path is the name of the entry in the archive.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    with zipfile.ZipFile(source) as archive:
+        for name in get_osu_entries(archive):
+            try:
+                m = read_osz_entry(archive, name)
+
+                if m is None:
+                    continue
+
+                result = {"path": name, "key_count": m.key_count, "stats": calc.from_map(m)}
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                result = {"path": name, "error": {"type": type(e).__name__, "message": str(e)}}
+
+            yield result
@@ -4,10 +4,26 @@ This module parses an .osu file (osu maina) and store its data in a structured f
 
 # pylint: disable=too-few-public-methods, line-too-long
 
+import io
+import os
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from itertools import chain
+from typing import IO, TYPE_CHECKING
+
+from profiling import Profiler
+
+if TYPE_CHECKING:
+    from columnar import ColumnarNotes
+
+
 class Note:
     '''
     Can contain either a regluar or long note
     '''
+    __slots__ = ("index", "hold_time", "release_time")
+
     def __init__(self, index: int, hold_time: int, release_time: int | None = None) ->None:
         self.index = index
         self.hold_time = hold_time
@@ -21,22 +37,117 @@ class Note:
 
 
 class MainaMap:
-    """notes should be sotred by time"""
+    """
+    notes should be sotred by time
+    Can be built either from a list of Note or from columnar arrays (see columnar.py).
+    The dicts are only built when they are accessed.
+    """
 
     def __init__(
         self,
         key_count: int,
-        notes: list[Note]
+        notes: list[Note] | None = None,
+        columns: "ColumnarNotes | None" = None,
     ) -> None:
+        if notes is None and columns is None:
+            raise ValueError("Either notes or columns must be given.")
+
         self.key_count = key_count
-        self.notes = notes
-        self.hold_notes_dict = self.__get_hold_notes_dict()
-        self.release_notes_dict = self.__get_release_notes_dict()
+        self.columns = columns
+        self._notes = notes
+        self._hold_notes_dict: dict[int, list[int]] | None = None
+        self._release_notes_dict: dict[int, list[int]] | None = None
+        self._release_index: dict[int, tuple[list[int], list[int]]] | None = None
+
+    @classmethod
+    def from_columns(cls, key_count: int, columns: "ColumnarNotes") -> "MainaMap":
+        """
+        Builds a map without creating any Note object.
+        """
+        return cls(key_count, columns=columns)
+
+    @property
+    def notes(self) -> list[Note]:
+        """
+        Notes sorted by time
+        """
+        if self._notes is None:
+            assert self.columns is not None
+            self._notes = self.columns.to_notes()
+
+        return self._notes
+
+    @property
+    def hold_notes_dict(self) -> dict[int, list[int]]:
+        '''
+        dict[time, index] (sorted)
+        '''
+        if self._hold_notes_dict is None:
+            if self.columns is not None:
+                self._hold_notes_dict = self.columns.get_hold_notes_dict()
+            else:
+                self._hold_notes_dict = self.__get_hold_notes_dict()
 
-    def __get_hold_notes_dict(self) -> dict[int,list[int]]:
+        return self._hold_notes_dict
+
+    @property
+    def release_notes_dict(self) -> dict[int, list[int]]:
         '''
         dict[time, index] (sorted)
         '''
+        if self._release_notes_dict is None:
+            if self.columns is not None:
+                self._release_notes_dict = self.columns.get_release_notes_dict()
+            else:
+                self._release_notes_dict = self.__get_release_notes_dict()
+
+        return self._release_notes_dict
+
+    @property
+    def release_index(self) -> dict[int, tuple[list[int], list[int]]]:
+        '''
+        dict[index, (release times, hold times)] of the long notes on each column, sorted by release time
+        '''
+        if self._release_index is None:
+            if self.columns is not None:
+                long_notes = self.columns.get_long_notes()
+            else:
+                long_notes = [
+                    (note.index, note.hold_time, note.release_time)
+                    for note in self.notes
+                    if note.release_time is not None
+                ]
+
+            release_index: dict[int, tuple[list[int], list[int]]] = {}
+
+            for index, hold_time, release_time in sorted(long_notes, key=lambda n: n[2]):
+                release_times, hold_times = release_index.setdefault(index, ([], []))
+                release_times.append(release_time)
+                hold_times.append(hold_time)
+
+            self._release_index = release_index
+
+        return self._release_index
+
+    def get_next_release_time(self, index: int, time: int) -> int | None:
+        '''
+        The first release on the column after time, in O(log n)
+        '''
+        release_times, _ = self.release_index.get(index, ([], []))
+        i = bisect_right(release_times, time)
+
+        return release_times[i] if i < len(release_times) else None
+
+    def is_held(self, index: int, time: int) -> bool:
+        '''
+        True if a long note on the column is pressed before time and released after it
+        '''
+        release_times, hold_times = self.release_index.get(index, ([], []))
+        i = bisect_right(release_times, time)
+
+        return i < len(release_times) and hold_times[i] < time
+
+    def __get_hold_notes_dict(self) -> dict[int,list[int]]:
         hold_notes_dict : dict[int, list[int]] = {}
 
         for note in self.notes:
@@ -49,9 +160,6 @@ class MainaMap:
         return dict(sorted(hold_notes_dict.items()))
 
     def __get_release_notes_dict(self) -> dict[int,list[int]]:
-        '''
-        dict[time, index] (sorted)
-        '''
         release_notes_dict : dict[int, list[int]] = {}
 
         for note in self.notes:
@@ -68,53 +176,246 @@ class MainaMap:
 
         return dict(sorted(release_notes_dict.items()))
 
+GENERAL_SECTION = "[General]"
+HIT_OBJECTS_SECTION = "[HitObjects]"
+
+# Mode of the [General] section (0 : osu!standard, 1 : taiko, 2 : catch)
+MANIA_MODE = 3
+
+# (index, hold_time, release_time)
+HitObject = tuple[int, int, int | None]
+
+
 def get_key_count(path: str) -> int:
     """
     Returns the maina key count from an osu! map file.
+    Stops reading at [HitObjects] since CircleSize is always in the header.
     """
     with open(path, "r", encoding="utf-8") as file:
-        lines = file.readlines()
+        return read_key_count(file)
+
+
+def read_mode(lines: Iterator[str]) -> tuple[int, Iterator[str]]:
+    """
+    Consumes lines up to the end of the [General] section and returns the game mode
+    (0 if it isn't set) with the remaining lines, which can still be parsed.
+    """
+    mode = 0
+
+    for line in lines:
+        stripped = line.strip()
+
+        if stripped.startswith("[") and stripped != GENERAL_SECTION:
+            return mode, chain([line], lines)
+
+        if stripped.startswith("Mode"):
+            mode = int(stripped.split(":", 1)[1])
+
+    return mode, lines
+
+
+class MapHeader:
+    """
+    Metadata of a map read from the lines before [HitObjects].
+    key_count is None if the map isn't a maina map (CircleSize is then the circle size),
+    hit_object_count is estimated from the size of the [HitObjects] section.
+    """
+    __slots__ = ("mode", "key_count", "title", "version", "hit_object_count")
+
+    def __init__(
+        self, mode: int, key_count: int | None, title: str, version: str, hit_object_count: int
+    ) -> None:
+        self.mode = mode
+        self.key_count = key_count
+        self.title = title
+        self.version = version
+        self.hit_object_count = hit_object_count
+
+    def is_mania(self) -> bool:
+        """
+        True if the map is a maina map (its mode is MANIA_MODE)
+        """
+        return self.mode == MANIA_MODE
 
-        for line in lines:
-            if line.startswith("CircleSize"):
-                return int(line.split(":")[1].strip())
 
+# Hit object lines read after [HitObjects] to estimate the length of a line
+HIT_OBJECT_SAMPLE_LINES = 32
+
+
+def scan_header(source: str | bytes) -> MapHeader:
+    """
+    Reads a map (a path, or the content of a file) up to [HitObjects]
+    (plus a few hit objects) without parsing any note,
+    to filter maps by mode and key count cheaply.
+    """
+    if isinstance(source, bytes):
+        return read_header(io.BytesIO(source), len(source))
+
+    with open(source, "rb") as file:
+        return read_header(file, os.fstat(file.fileno()).st_size)
+
+
+def read_header(file: IO[bytes], size: int) -> MapHeader:
+    """
+    Reads the header of a map from a binary file of size bytes
+    """
+    fields: dict[bytes, bytes] = {}
+    hit_object_count = 0
+
+    for line in file:
+        stripped = line.strip()
+
+        if stripped == HIT_OBJECTS_SECTION.encode():
+            hit_object_count = estimate_hit_object_count(file, size)
+            break
+
+        name, separator, value = stripped.partition(b":")
+
+        if separator and name.strip() in (b"Mode", b"CircleSize", b"Title", b"Version"):
+            fields.setdefault(name.strip(), value.strip())
+
+    mode = int(fields.get(b"Mode", b"0"))
+    circle_size = fields.get(b"CircleSize")
+
+    return MapHeader(
+        mode,
+        int(float(circle_size)) if mode == MANIA_MODE and circle_size is not None else None,
+        fields.get(b"Title", b"").decode("utf-8", "replace"),
+        fields.get(b"Version", b"").decode("utf-8", "replace"),
+        hit_object_count,
+    )
+
+
+def estimate_hit_object_count(file: IO[bytes], size: int) -> int:
+    """
+    Counts the first lines of the [HitObjects] section and extrapolates
+    their average length to the rest of the file
+    """
+    count = 0
+    sampled_bytes = 0
+
+    for line in file:
+        sampled_bytes += len(line)
+
+        if line.strip():
+            count += 1
+
+        if count == HIT_OBJECT_SAMPLE_LINES:
+            return count + round((size - file.tell()) * count / sampled_bytes)
+
+    return count
+
+
+def read_key_count(lines: Iterator[str]) -> int:
+    """
+    Consumes lines up to (and including) the [HitObjects] header and returns the key count.
+    The remaining lines of the iterator are the hit objects.
+    """
+    key_count: int | None = None
+
+    for line in lines:
+        if key_count is None and line.startswith("CircleSize"):
+            key_count = int(line.split(":")[1].strip())
+        elif line.strip() == HIT_OBJECTS_SECTION:
+            break
+
+    if key_count is None:
         raise ValueError("Key count not found in the map file.")
 
+    return key_count
 
-def parse_map(path: str) -> MainaMap:
+
+def iter_hit_objects(lines: Iterable[str], key_count: int) -> Iterator[HitObject]:
     """
+    Yields hit objects one line at a time from the [HitObjects] section.
     Long notes are treated as regular notes
     """
-
     tolerance = 0.1
-    notes : list[Note] = []
 
-    key_count = get_key_count(path)
+    for line in lines:
+        if not line.strip():
+            continue
+
+        tokens = line.split(",")
+        index = int(int(tokens[0]) * key_count / 512 + tolerance)
+        hold_time = int(tokens[2])
+        object_type = int(tokens[3])
+
+        # if a regular note
+        if object_type == 1:
+            yield index, hold_time, None
+        elif object_type == 128:
+            yield index, hold_time, int(tokens[5].split(":")[0])
 
-    with open(path, "r", encoding="utf-8") as file:
-        lines = file.readlines()
 
-        object_start_line = 0
+def stream_map(file: Iterable[str]) -> tuple[int, Iterator[HitObject]]:
+    """
+    Reads the header of an already opened map and returns the key count
+    with a lazy iterator over its hit objects, so the file is read only once.
+    """
+    lines = iter(file)
+    key_count = read_key_count(lines)
+
+    return key_count, iter_hit_objects(lines, key_count)
+
+
+@contextmanager
+def open_text(file: bytes | IO[str] | IO[bytes]) -> Iterator[IO[str]]:
+    """
+    Reads the content of a map or an already opened file (text or binary) as text.
+    The file is left open.
+    """
+    if isinstance(file, bytes):
+        file = io.BytesIO(file)
+
+    if isinstance(file, io.TextIOBase):
+        yield file
+        return
+
+    text = io.TextIOWrapper(file, encoding="utf-8", newline=None)  # type: ignore[arg-type]
+
+    try:
+        yield text
+    finally:
+        text.detach()
+
+
+def parse_map(
+    source: "str | os.PathLike[str] | bytes | IO[str] | IO[bytes]",
+    profiler: Profiler | None = None,
+) -> MainaMap:
+    """
+    Long notes are treated as regular notes
+    source : a path, the content of a map, or a file object opened in text or binary mode
+    (such as an entry of a zip file)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding="utf-8") as file:
+            return parse_lines(file, profiler)
+
+    with open_text(source) as file:
+        return parse_lines(file, profiler)
+
+
+def parse_lines(lines: Iterable[str], profiler: Profiler | None = None) -> MainaMap:
+    """
+    Same as parse_map but for the lines of a map which is already read
+    """
+    if profiler is None:
+        key_count, hit_objects = stream_map(lines)
+        notes = [Note(*hit_object) for hit_object in hit_objects]
 
-        for line in lines:
-            object_start_line += 1
+        return MainaMap(key_count, notes)
 
-            if line.strip() == "[HitObjects]":
-                break
+    lines = iter(lines)
 
-        for line in lines[object_start_line:]:
-            tokens = line.split(",")
-            index = int(int(tokens[0]) * key_count / 512 + tolerance)
-            hold_time = int(tokens[2])
+    with profiler.stage("key_count"):
+        key_count = read_key_count(lines)
 
-            # if a regular note     
-            if int(tokens[3]) == 1:
-                notes.append(Note(index, hold_time))
-            elif int(tokens[3]) == 128:
-                release_time = int(tokens[5].split(':')[0])
+    with profiler.stage("parse"):
+        notes = [Note(*hit_object) for hit_object in iter_hit_objects(lines, key_count)]
 
-                notes.append(Note(index, hold_time, release_time))
+    profiler.count("notes", len(notes))
 
     return MainaMap(key_count, notes)
 
@@ -0,0 +1,105 @@
+"""
+This module records where the time goes inside the rating, stage by stage.
+It is opt-in: pass a Profiler to calc.from_file, or set MAINA_PROFILE
+("1" for wall time and counts, "alloc" to also trace allocations).
+"""
+
+import os
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+PROFILE_ENV_VAR = "MAINA_PROFILE"
+
+
+class Profiler:
+    """
+    Wall time, allocations and number of calls of each stage, plus free counters
+    """
+
+    def __init__(self, trace_allocations: bool = False) -> None:
+        self.trace_allocations = trace_allocations
+        self.stages: dict[str, dict[str, float]] = {}
+        self.counts: dict[str, int] = {}
+        # Peak traced memory of each open stage, as reset_peak only keeps the innermost one
+        self.peak_stack: list[int] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Measures the code inside the with block
+        """
+        started_tracing = False
+
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+
+            start_memory, peak_memory = tracemalloc.get_traced_memory()
+
+            if self.peak_stack:
+                self.peak_stack[-1] = max(self.peak_stack[-1], peak_memory)
+
+            tracemalloc.reset_peak()
+            self.peak_stack.append(start_memory)
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            record = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            record["calls"] += 1
+            record["seconds"] += seconds
+
+            if self.trace_allocations:
+                memory, peak_memory = tracemalloc.get_traced_memory()
+                peak_memory = max(peak_memory, self.peak_stack.pop())
+
+                if self.peak_stack:
+                    self.peak_stack[-1] = max(self.peak_stack[-1], peak_memory)
+
+                record["allocated_bytes"] = record.get("allocated_bytes", 0) + memory - start_memory
+                record["peak_bytes"] = max(record.get("peak_bytes", 0), peak_memory - start_memory)
+
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def count(self, name: str, n: int = 1) -> None:
+        """
+        Adds n to a counter (notes, chords, ...)
+        """
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def get_report(self) -> dict[str, Any]:
+        """
+        {"stages": {name: {"calls", "seconds", ...}}, "counts": {name: n}}
+        """
+        return {
+            "stages": {name: record.copy() for name, record in self.stages.items()},
+            "counts": self.counts.copy(),
+        }
+
+
+_ENV_PROFILER: Profiler | None = None
+
+
+def get_env_profiler() -> Profiler | None:
+    """
+    The profiler of this process if MAINA_PROFILE is set, None otherwise
+    """
+    global _ENV_PROFILER  # pylint: disable=global-statement
+
+    setting = os.environ.get(PROFILE_ENV_VAR, "")
+
+    if setting in ("", "0"):
+        return None
+
+    if _ENV_PROFILER is None:
+        _ENV_PROFILER = Profiler(trace_allocations=setting == "alloc")
+
+    return _ENV_PROFILER
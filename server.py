@@ -0,0 +1,311 @@
+"""
+This module runs a local HTTP server rating osu maina maps on warm worker processes,
+so a web backend doesn't pay for a new interpreter per map.
+
+POST /rate     body: an .osu file, returns the same JSON as main.py
+POST /batch    body: {"maps": [.osu file, ...]}, returns a list of results
+               ({"stats": ...} or {"error": {"type", "message"}})
+GET  /metrics  queue depth and per stage latency
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import calc
+from parse import parse_lines
+
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+# queue : waiting for a worker, parse/calc : inside the worker, total : the whole request
+STAGES = ("queue", "parse", "calc", "total")
+
+ROUTE_METHODS = {"/metrics": "GET", "/rate": "POST", "/batch": "POST"}
+
+HTTP_STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+}
+
+
+def rate_text(text: str, submitted_at: float) -> dict[str, Any]:
+    """
+    Runs in a worker process.
+    Returns {"stats", "timings"} or {"error", "timings"}
+    """
+    started_at = time.time()
+    timings = {"queue": started_at - submitted_at}
+
+    try:
+        start = time.perf_counter()
+        m = parse_lines(io.StringIO(text, newline=None))
+        timings["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stats = calc.from_map(m)
+        timings["calc"] = time.perf_counter() - start
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return {"error": {"type": type(e).__name__, "message": str(e)}, "timings": timings}
+
+    return {"stats": stats, "timings": timings}
+
+
+def warm_up() -> int:
+    """
+    Makes the pool start a worker (calc is already imported by then)
+    """
+    return os.getpid()
+
+
+class LatencyStats:
+    """
+    Latency of the last samples of a stage
+    """
+
+    def __init__(self, size: int = 1000) -> None:
+        self.samples: deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        """
+        Adds a sample
+        """
+        self.samples.append(seconds)
+        self.count += 1
+
+    def get_summary(self) -> dict[str, float]:
+        """
+        Milliseconds, over the kept samples
+        """
+        if not self.samples:
+            return {"count": self.count}
+
+        samples = sorted(self.samples)
+
+        return {
+            "count": self.count,
+            "mean_ms": sum(samples) / len(samples) * 1000,
+            "p50_ms": samples[len(samples) // 2] * 1000,
+            "p95_ms": samples[min(len(samples) - 1, len(samples) * 95 // 100)] * 1000,
+            "max_ms": samples[-1] * 1000,
+        }
+
+
+class RatingService:
+    """
+    Sends maps to a pool of worker processes and keeps track of the load
+    """
+
+    def __init__(self, workers: int | None = None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.queue_depth = 0
+        self.latency = {stage: LatencyStats() for stage in STAGES}
+
+    async def start(self) -> None:
+        """
+        Starts every worker before the first request comes in
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self.executor, warm_up) for _ in range(self.workers))
+        )
+
+    def close(self) -> None:
+        """
+        Stops the workers
+        """
+        self.executor.shutdown()
+
+    async def rate(self, text: str) -> dict[str, Any]:
+        """
+        Rates a map on a worker
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.queue_depth += 1
+
+        try:
+            result = await loop.run_in_executor(self.executor, rate_text, text, time.time())
+        finally:
+            self.queue_depth -= 1
+
+        for stage, seconds in result.pop("timings").items():
+            self.latency[stage].add(seconds)
+        self.latency["total"].add(time.perf_counter() - start)
+
+        return result
+
+    async def rate_many(self, texts: list[str]) -> list[dict[str, Any]]:
+        """
+        Rates maps on all the workers at once
+        """
+        return await asyncio.gather(*(self.rate(text) for text in texts))
+
+    def get_metrics(self) -> dict[str, Any]:
+        """
+        Current load of the service
+        """
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "latency": {stage: stats.get_summary() for stage, stats in self.latency.items()},
+        }
+
+
+async def read_request(
+    reader: asyncio.StreamReader,
+) -> tuple[str, str, dict[str, str], bytes] | None:
+    """
+    Returns (method, path, headers, body), or None if the client closed the connection
+    """
+    request_line = await reader.readline()
+
+    if not request_line.strip():
+        return None
+
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers: dict[str, str] = {}
+
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+
+        if not line:
+            break
+
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    content_length = int(headers.get("content-length", "0"))
+
+    if content_length > MAX_BODY_SIZE:
+        raise ValueError("body too large")
+
+    body = await reader.readexactly(content_length)
+
+    return method, path, headers, body
+
+
+def write_response(
+    writer: asyncio.StreamWriter, status: int, body: Any, keep_alive: bool
+) -> None:
+    """
+    Writes a JSON response
+    """
+    encoded = json.dumps(body).encode()
+    writer.write(
+        (
+            f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(encoded)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        ).encode()
+        + encoded
+    )
+
+
+async def handle_request(
+    service: RatingService, method: str, path: str, body: bytes
+) -> tuple[int, Any]:
+    """
+    Returns (status, JSON body) of a request
+    """
+    if path not in ROUTE_METHODS:
+        return 404, {"error": {"type": "NotFound", "message": path}}
+
+    if method != ROUTE_METHODS[path]:
+        return 405, {"error": {"type": "MethodNotAllowed", "message": f"use {ROUTE_METHODS[path]}"}}
+
+    if path == "/metrics":
+        return 200, service.get_metrics()
+
+    try:
+        if path == "/rate":
+            result = await service.rate(body.decode("utf-8"))
+
+            return (422, result) if "error" in result else (200, result["stats"])
+
+        maps = json.loads(body)["maps"]
+
+        if not isinstance(maps, list) or not all(isinstance(content, str) for content in maps):
+            raise TypeError('"maps" must be a list of map contents')
+    except (UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        return 400, {"error": {"type": type(e).__name__, "message": str(e)}}
+
+    return 200, await service.rate_many(maps)
+
+
+async def handle_connection(
+    service: RatingService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """
+    Serves the requests of a (keep-alive) connection
+    """
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                status = 413 if str(e) == "body too large" else 400
+                error = {"error": {"type": "BadRequest", "message": str(e)}}
+                write_response(writer, status, error, False)
+                break
+
+            if request is None:
+                break
+
+            method, path, headers, body = request
+            keep_alive = headers.get("connection", "").lower() != "close"
+            status, response = await handle_request(service, method, path, body)
+            write_response(writer, status, response, keep_alive)
+            await writer.drain()
+
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int, workers: int | None) -> None:
+    """
+    Runs the server until it is cancelled
+    """
+    service = RatingService(workers)
+    await service.start()
+
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(service, reader, writer), host, port
+    )
+    print(f"Serving on http://{host}:{port} with {service.workers} workers", flush=True)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Rates osu maina maps over HTTP.")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument("--workers", type=int, default=None)
+    args = arg_parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,187 @@
+"""
+This module finds the maps of a corpus whose pattern stats are the closest to a map.
+The stats are kept in one float32 matrix (which can be memory-mapped from disk),
+so a query is a single matrix-vector product.
+
+python similarity.py build --db corpus.sqlite3 --out similarity
+python similarity.py query map.osu --index similarity -k 10 --metric cosine
+"""
+
+import argparse
+import json
+from collections.abc import Sequence
+
+import numpy as np
+
+import calc
+from calc import PatternType
+from corpus import DEFAULT_INDEX_PATH, CorpusIndex
+
+# OVERALL is the sum of the others, it would only weight them twice
+VECTOR_PATTERNS = [pattern for pattern in PatternType if pattern != PatternType.OVERALL]
+METRICS = ("cosine", "euclidean")
+
+
+def get_stat_vector(stats: dict[str, float]) -> np.ndarray:
+    """
+    The stats of a map (butified) as a vector ordered as VECTOR_PATTERNS
+    """
+    return np.array([stats[pattern.name] for pattern in VECTOR_PATTERNS], dtype=np.float32)
+
+
+class SimilarityIndex:
+    """
+    vectors[i] is the stat vector of paths[i] divided by scale (the mean of each pattern
+    over the corpus), so every pattern counts about the same in the distances.
+    """
+
+    def __init__(
+        self, paths: list[str], vectors: np.ndarray, scale: np.ndarray | None = None
+    ) -> None:
+        if scale is None:
+            scale = vectors.mean(axis=0) if len(vectors) else np.ones(len(VECTOR_PATTERNS))
+            scale = np.where(scale > 0, scale, 1).astype(np.float32)
+            vectors = vectors / scale
+
+        self.paths = paths
+        self.scale = scale
+        self.vectors = vectors
+        self.norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @classmethod
+    def from_corpus(cls, corpus: CorpusIndex) -> "SimilarityIndex":
+        """
+        Every rated map of a corpus index
+        """
+        columns = ", ".join(pattern.name for pattern in VECTOR_PATTERNS)
+        rows = corpus.connection.execute(
+            f"SELECT path, {columns} FROM maps WHERE error IS NULL ORDER BY path"
+        ).fetchall()
+
+        return cls(
+            [row[0] for row in rows],
+            np.array([row[1:] for row in rows], dtype=np.float32).reshape(-1, len(VECTOR_PATTERNS)),
+        )
+
+    def save(self, prefix: str) -> None:
+        """
+        Writes prefix.npy (the matrix) and prefix.json (the paths and the scale)
+        """
+        np.save(f"{prefix}.npy", np.ascontiguousarray(self.vectors, dtype=np.float32))
+
+        with open(f"{prefix}.json", "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "patterns": [pattern.name for pattern in VECTOR_PATTERNS],
+                    "scale": self.scale.tolist(),
+                    "paths": self.paths,
+                },
+                file,
+            )
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True) -> "SimilarityIndex":
+        """
+        Reads an index written by save, the matrix is memory-mapped unless mmap is False
+        """
+        with open(f"{prefix}.json", "r", encoding="utf-8") as file:
+            metadata = json.load(file)
+
+        if metadata["patterns"] != [pattern.name for pattern in VECTOR_PATTERNS]:
+            raise ValueError("The index was built with other patterns, build it again.")
+
+        return cls(
+            metadata["paths"],
+            np.load(f"{prefix}.npy", mmap_mode="r" if mmap else None),
+            np.array(metadata["scale"], dtype=np.float32),
+        )
+
+    def get_scores(self, queries: np.ndarray, metric: str = "cosine") -> np.ndarray:
+        """
+        (query count, map count) similarity of raw stat vectors to every map,
+        higher is closer (cosine similarity, or the negative euclidean distance)
+        """
+        queries = np.atleast_2d(queries).astype(np.float32) / self.scale
+        products = queries @ self.vectors.T
+        query_norms = np.linalg.norm(queries, axis=1)[:, None]
+
+        if metric == "cosine":
+            return products / np.maximum(query_norms * self.norms, np.finfo(np.float32).tiny)
+
+        if metric == "euclidean":
+            squared = query_norms**2 + self.norms**2 - 2 * products
+            return -np.sqrt(np.maximum(squared, 0))
+
+        raise ValueError(f"Unknown metric {metric}, use one of {METRICS}.")
+
+    def query_many(
+        self, queries: np.ndarray, k: int = 10, metric: str = "cosine"
+    ) -> list[list[tuple[str, float]]]:
+        """
+        The k closest maps (path, score) of each query, closest first
+        """
+        scores = self.get_scores(queries, metric)
+        k = min(k, len(self))
+
+        if k == 0:
+            return [[] for _ in scores]
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+
+        return [
+            [
+                (self.paths[i], float(score))
+                for i, score in zip(indexes[row_order], row_scores[row_order])
+            ]
+            for indexes, row_scores, row_order in zip(top, top_scores, order)
+        ]
+
+    def query(
+        self, stats: dict[str, float], k: int = 10, metric: str = "cosine"
+    ) -> list[tuple[str, float]]:
+        """
+        The k closest maps (path, score) to the stats of a map, closest first
+        """
+        return self.query_many(get_stat_vector(stats), k, metric)[0]
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """
+    Entry point of the command line
+    """
+    parser = argparse.ArgumentParser(description="Finds maps with similar pattern stats.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="builds an index from a corpus index")
+    build_parser.add_argument("--db", default=DEFAULT_INDEX_PATH, help="sqlite file of corpus.py")
+    build_parser.add_argument("--out", default="similarity", help="prefix of the index files")
+
+    query_parser = subparsers.add_parser("query", help="prints the maps closest to a map")
+    query_parser.add_argument("path", help="path to an .osu file")
+    query_parser.add_argument("--index", default="similarity", help="prefix of the index files")
+    query_parser.add_argument("-k", type=int, default=10)
+    query_parser.add_argument("--metric", choices=METRICS, default="cosine")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        with CorpusIndex(args.db) as corpus:
+            index = SimilarityIndex.from_corpus(corpus)
+
+        index.save(args.out)
+        print(json.dumps({"maps": len(index)}))
+        return
+
+    index = SimilarityIndex.load(args.index)
+
+    for path, score in index.query(calc.from_file(args.path), args.k, args.metric):
+        print(json.dumps({"path": path, "score": score}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+This module writes a parsed map to a compact binary snapshot next to the .osu file,
+so maps which are rated again and again are loaded without parsing any text.
+
+A snapshot is a fixed size header followed by the int32 arrays of a ColumnarNotes
+(columns, hold_times, release_times, chord_offsets). It is loaded with numpy.memmap,
+the arrays are views of the mapped file.
+
+python snapshot.py songs/ "packs/**/*.osu"
+"""
+
+import argparse
+import json
+import os
+import struct
+from collections.abc import Iterable
+
+import numpy as np
+
+from columnar import ColumnarNotes, parse_columnar_map
+from map_files import find_map_files
+from parse import MainaMap
+
+SNAPSHOT_EXTENSION = ".mms"
+SNAPSHOT_MAGIC = b"MAINASNP"
+
+# Bumped whenever the layout or the parsing of the notes changes
+SNAPSHOT_VERSION = 1
+
+# magic, version, key count, note count, chord count, size and mtime (ns) of the .osu file
+HEADER_FORMAT = "<8sIIIIqq"
+HEADER_SIZE = 64
+
+
+def get_snapshot_path(path: str) -> str:
+    """
+    The snapshot of a map is stored next to it
+    """
+    return path + SNAPSHOT_EXTENSION
+
+
+def write_snapshot(path: str, m: MainaMap | None = None) -> str:
+    """
+    Writes the snapshot of a map (parsed from path if m isn't given), returns its path
+    """
+    stat = os.stat(path)
+
+    if m is None:
+        m = parse_columnar_map(path)
+
+    columns = m.columns if m.columns is not None else ColumnarNotes.from_notes(m.notes)
+
+    header = struct.pack(
+        HEADER_FORMAT,
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        m.key_count,
+        len(columns),
+        columns.chord_count,
+        stat.st_size,
+        stat.st_mtime_ns,
+    )
+    snapshot_path = get_snapshot_path(path)
+    temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+
+    with open(temp_path, "wb") as file:
+        file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+        for values in (
+            columns.columns,
+            columns.hold_times,
+            columns.release_times,
+            columns.chord_offsets,
+        ):
+            file.write(np.ascontiguousarray(values, dtype="<i4").tobytes())
+
+    # Readers never see a half written snapshot
+    os.replace(temp_path, snapshot_path)
+
+    return snapshot_path
+
+
+def load_snapshot(path: str) -> MainaMap | None:
+    """
+    Loads the snapshot of a map, or returns None if there is none, if it is damaged
+    or if the .osu file changed since it was written
+    """
+    snapshot_path = get_snapshot_path(path)
+
+    try:
+        stat = os.stat(path)
+
+        with open(snapshot_path, "rb") as file:
+            header = file.read(HEADER_SIZE)
+            snapshot_size = os.fstat(file.fileno()).st_size
+    except OSError:
+        return None
+
+    if len(header) < HEADER_SIZE:
+        return None
+
+    magic, version, key_count, note_count, chord_count, size, mtime_ns = struct.unpack_from(
+        HEADER_FORMAT, header
+    )
+    value_count = note_count * 3 + chord_count + 1
+
+    if (magic, version, size, mtime_ns, snapshot_size) != (
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        stat.st_size,
+        stat.st_mtime_ns,
+        HEADER_SIZE + 4 * value_count,
+    ):
+        return None
+
+    try:
+        values = np.memmap(
+            snapshot_path, dtype="<i4", mode="r", offset=HEADER_SIZE, shape=(value_count,)
+        )
+    except (OSError, ValueError):
+        # Replaced or truncated since the header was read
+        return None
+
+    return MainaMap.from_columns(
+        key_count,
+        ColumnarNotes.from_sorted_arrays(
+            values[:note_count],
+            values[note_count : note_count * 2],
+            values[note_count * 2 : note_count * 3],
+            values[note_count * 3 :],
+        ),
+    )
+
+
+def write_snapshots(paths: Iterable[str]) -> dict[str, int]:
+    """
+    Writes the snapshots which are missing or out of date,
+    returns the number of "written", "up_to_date" and "errors" maps
+    """
+    counts = {"written": 0, "up_to_date": 0, "errors": 0}
+
+    for path in paths:
+        if load_snapshot(path) is not None:
+            counts["up_to_date"] += 1
+            continue
+
+        try:
+            write_snapshot(path)
+            counts["written"] += 1
+        except (OSError, ValueError, IndexError):
+            counts["errors"] += 1
+
+    return counts
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Writes binary snapshots of osu maina maps.")
+    arg_parser.add_argument("paths", nargs="+", help="files, directories, globs or path lists")
+    args = arg_parser.parse_args()
+
+    print(json.dumps(write_snapshots(find_map_files(args.paths))))
@@ -0,0 +1,31 @@
+"""
+This module tests functions in batch.py
+"""
+
+import batch
+import calc
+
+
+def test_rate_files():
+    """
+    Every map gets a result, the broken ones get an error instead of stats.
+    """
+    results = {
+        result["path"]: result
+        for result in batch.rate_files(["test_files/jump.osu", "test_files/missing.osu"], 1)
+    }
+
+    assert results["test_files/jump.osu"]["stats"] == calc.from_file("test_files/jump.osu")
+    assert results["test_files/missing.osu"]["error"]["type"] == "FileNotFoundError"
+
+
+def test_rate_file_reuses_cache(tmp_path):
+    """
+    The cache is opened once per process, not once per map.
+    """
+    cache_path = str(tmp_path / "results.sqlite3")
+    result = batch.rate_file("test_files/jump.osu", cache_path)
+
+    assert batch.rate_file("test_files/jump.osu", cache_path) == result
+    assert batch.open_cache(cache_path) is batch.open_cache(cache_path)
+    assert result["stats"] == calc.from_file("test_files/jump.osu")
@@ -0,0 +1,23 @@
+"""
+This module tests functions in bench.py
+"""
+
+import bench
+
+
+def test_find_regressions():
+    """
+    Only the stages slower than the threshold are reported.
+    """
+    baseline = bench.bench_file("test_files/jump.osu", 1)
+    current = {**baseline, "seconds": {**baseline["seconds"]}}
+    current["seconds"]["hold"] *= 2
+
+    regressions = bench.find_regressions(
+        {"files": {"jump": current}, "packs": {}},
+        {"files": {"jump": baseline}, "packs": {}},
+        bench.DEFAULT_THRESHOLD,
+    )
+
+    assert len(regressions) == 1
+    assert "jump [hold]" in regressions[0]
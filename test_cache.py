@@ -0,0 +1,53 @@
+"""
+This module tests functions in cache.py
+"""
+
+import calc
+from cache import ResultCache
+
+
+def test_result_cache(tmp_path):
+    """
+    A map rated twice is only calculated once, and the cache stays under its size.
+    """
+    with ResultCache(str(tmp_path / "results.sqlite3"), max_bytes=1000) as cache:
+        stats = calc.from_file("test_files/jump.osu", cache)
+
+        with open("test_files/jump.osu", "rb") as file:
+            key = cache.get_key(file.read())
+
+        assert stats == calc.from_file("test_files/jump.osu")
+        assert cache.get(key) == {"key_count": 4, "stats": stats}
+
+        for file_name in ["delay.osu", "hand.osu", "chordjack.osu"]:
+            calc.from_file(f"test_files/{file_name}", cache)
+
+        assert cache.get(key) is None
+
+
+def test_algorithm_version(monkeypatch):
+    """
+    Cached stats are invalidated when the weights change.
+    """
+    version = calc.get_algorithm_version()
+
+    monkeypatch.setitem(calc.HOLD_NOTE_PATTERN_WEIGHTS, calc.PatternType.SPEED_JACK, 3.0)
+
+    assert calc.get_algorithm_version() != version
+
+
+def test_result_cache_total_size(tmp_path):
+    """
+    The running total of the sizes follows replaced results and is counted again on open.
+    """
+    path = str(tmp_path / "results.sqlite3")
+
+    with ResultCache(path) as cache:
+        cache.put("a", {"stats": 1})
+        cache.put("b", {"stats": 2})
+        cache.put("a", {"stats": 10})
+
+        assert cache.total_size == len('{"stats": 10}') + len('{"stats": 2}')
+
+    with ResultCache(path) as cache:
+        assert cache.total_size == len('{"stats": 10}') + len('{"stats": 2}')
@@ -6,14 +6,29 @@ This module tests functions in calc.py
 
 import json
 import os
+from itertools import permutations, product
 
+import pytest
+
+import columnar
 import parse
+import vectorized
+from incremental import IncrementalRater
+from tune import get_dan_courses
 
 from calc import (
     MainaMap,
     PatternType,
+    get_chord_mask,
     get_pattern_type,
+    lookup_pattern_type,
+    get_column_mask,
+    get_pattern_type_from_masks,
+    calc_hold_note_pattern_stats,
     calc_4k_hold_note_pattern_stats,
+    calc_4k_release_note_pattern_stats,
+    calc_4k_pattern_stats,
+    calc_ln_hold_stats,
     butify_pattern_stats,
 )
 
@@ -55,7 +70,7 @@ def calc_4k_raw_stats_sum(m: MainaMap) -> float:
     return sum(pattern_stats.values())
 
 
-def test_calc_4k_raw_stats_sum():
+def test_calc_4k_raw_stats_sum(corpus):
     """
     A test to check if the raw stats sums are equal for all 4k maps.
     """
@@ -70,7 +85,7 @@ def test_calc_4k_raw_stats_sum():
     file_names_4k: list[str] = []
 
     for file_name in all_file_names:
-        m = parse.parse_map(file_name)
+        m = corpus[file_name]
 
         if m.key_count != 4:
             continue
@@ -90,43 +105,195 @@ def test_calc_4k_raw_stats_sum():
             )
 
 
-def test_reform_dan():
+def test_vectorized_pattern_stats(corpus):
     """
-    A test to check if the dans' difficulty is appropirately calculated
+    The vectorized engine has to give the same stats as the original one.
     """
 
-    all_file_names: list[str] = []
-
-    all_file_names.append(
-        "test_files/reform/Various Artists - Dan ~ REFORM ~ 1st Pack v2 (DDMythical) [~ 1st ~ (Marathon)].osu"
-    )
+    all_file_names: list[str] = [
+        f"./test_files/{file}"
+        for file in os.listdir("./test_files")
+        if file.endswith(".osu")
+    ]
     all_file_names.append(
-        "test_files/reform/Various Artists - Dan ~ REFORM ~ 1st Pack v2 (DDMythical) [~ 2nd ~ (Marathon)].osu"
+        "test_files/LN/Various Artists - 4K LN Dan Courses v2 - Level 1 - (_underjoy) [1st Dan (Marathon)].osu"
     )
-    all_file_names.append(
-        "test_files/reform/Various Artists - Dan ~ REFORM ~ 1st Pack v2 (DDMythical) [~ 3rd ~ (Marathon)].osu"
+
+    for file_name in all_file_names:
+        m = corpus[file_name]
+        columns = columnar.ColumnarNotes.from_notes(m.notes)
+
+        assert vectorized.calc_4k_hold_note_pattern_stats_vectorized(
+            columns
+        ) == pytest.approx(calc_4k_hold_note_pattern_stats(m.hold_notes_dict)), file_name
+
+        if len(m.release_notes_dict) > 2:
+            assert vectorized.calc_4k_release_note_pattern_stats_vectorized(
+                columns
+            ) == pytest.approx(
+                calc_4k_release_note_pattern_stats(m.hold_notes_dict, m.release_notes_dict)
+            ), file_name
+
+
+def test_vectorized_pattern_stats_chord_order():
+    """
+    get_pattern_type compares chords as lists, so [0, 3] and [3, 0] are different chords.
+    """
+
+    notes = [
+        parse.Note(index, time)
+        for time, chord in enumerate([[0, 3], [1], [3, 0], [2], [0, 3], [1, 2], [0, 3], [0]])
+        for index in chord
+    ]
+    m = MainaMap(4, notes)
+
+    assert vectorized.calc_4k_hold_note_pattern_stats_vectorized(
+        columnar.ColumnarNotes.from_notes(notes)
+    ) == pytest.approx(calc_4k_hold_note_pattern_stats(m.hold_notes_dict))
+
+
+def test_pattern_stats_for_rates(corpus):
+    """
+    Rating once for many rates is the same as rating a map with rescaled times.
+    """
+
+    m = corpus["test_files/chordjack.osu"]
+    rates = [0.8, 1.0, 1.5]
+    rate_stats = vectorized.calc_4k_hold_note_pattern_stats_for_rates(
+        columnar.ColumnarNotes.from_notes(m.notes), rates
     )
-    for i in range(4, 7):
-        all_file_names.append(
-            f"test_files/reform/Various Artists - Dan ~ REFORM ~ 1st Pack v2 (DDMythical) [~ {i}th ~ (Marathon)].osu"
-        )
 
-    for i in range(7, 11):
-        all_file_names.append(
-            f"test_files/reform/Various Artists - Dan ~ REFORM ~ 2nd Pack (DDMythical) [~ {i}th ~ (Marathon)].osu"
+    for rate, pattern_stats in zip(rates, rate_stats):
+        rescaled_m = MainaMap(
+            m.key_count, [parse.Note(note.index, note.hold_time / rate) for note in m.notes]
         )
 
-    for c in ["ALPHA", "BETA", "GAMMA", "DELTA", "EPSILON"]:
-        all_file_names.append(
-            f"test_files/reform/Various Artists - Dan ~ REFORM ~ 2nd Pack (DDMythical) [~ EXTRA-{c} ~ (Marathon)].osu"
+        assert pattern_stats == pytest.approx(
+            calc_4k_hold_note_pattern_stats(rescaled_m.hold_notes_dict)
         )
 
+
+def test_pattern_table():
+    """
+    Every triple of 4k chords (in every column order) is looked up as get_pattern_type classifies it.
+    """
+
+    chords = [list(chord) for size in range(1, 5) for chord in permutations(range(4), size)]
+    masks = [get_chord_mask(chord) for chord in chords]
+
+    for (chord1, mask1), (chord2, mask2), (chord3, mask3) in product(zip(chords, masks), repeat=3):
+        assert lookup_pattern_type(chord1, mask1, chord2, mask2, chord3, mask3) == get_pattern_type(
+            chord1, chord2, chord3
+        ), (chord1, chord2, chord3)
+
+
+def test_pattern_type_from_masks():
+    """
+    The n-key classification of 4k chords is the same as get_pattern_type.
+    """
+
+    chords = [list(chord) for size in range(1, 5) for chord in permutations(range(4), size)]
+    masks = [get_column_mask(chord) for chord in chords]
+
+    for (chord1, mask1), (chord2, mask2), (chord3, mask3) in product(zip(chords, masks), repeat=3):
+        assert get_pattern_type_from_masks(
+            mask1, mask2, mask3, 4, chord1 == chord2, chord1 == chord3
+        ) == get_pattern_type(chord1, chord2, chord3), (chord1, chord2, chord3)
+
+
+def test_calc_n_key_hold_note_pattern_stats(corpus):
+    """
+    Maps of higher key modes are rated, 4k maps are rated the same as before.
+    """
+
+    m = corpus["test_files/chordjack.osu"]
+
+    assert calc_hold_note_pattern_stats(m.hold_notes_dict, 4) == calc_4k_hold_note_pattern_stats(
+        m.hold_notes_dict
+    )
+
+    chords = [[0, 1, 2, 3, 4, 5, 6], [3], [0, 6], [1, 5], [0, 6], [2, 3, 4], [6], [5], [6]]
+    notes = [
+        parse.Note(index, time * 100) for time, chord in enumerate(chords) for index in chord
+    ]
+    pattern_stats = calc_hold_note_pattern_stats(MainaMap(7, notes).hold_notes_dict, 7)
+
+    assert pattern_stats[PatternType.SPLIT_TRILL] > 0
+    assert pattern_stats[PatternType.HAND_STREAM] > 0
+    assert pattern_stats[PatternType.DENSE_CHORD_JACK] > 0
+
+
+def test_n_key_engines():
+    """
+    The vectorized and incremental engines rate higher key modes the same as calc.
+    """
+
+    chords = [[0], [3], [0], [3], [0], [0, 1, 2, 3, 4], [6], [1, 5], [0, 6], [2, 3, 4], [6], [5]]
+    notes = [
+        parse.Note(index, time * 100) for time, chord in enumerate(chords) for index in chord
+    ]
+    m = MainaMap(7, notes)
+    pattern_stats = calc_hold_note_pattern_stats(m.hold_notes_dict, 7)
+
+    assert vectorized.calc_hold_note_pattern_stats_vectorized(
+        columnar.ColumnarNotes.from_notes(m.notes), 7
+    ) == pytest.approx(pattern_stats)
+    assert IncrementalRater(MainaMap(7, list(notes))).get_pattern_stats() == pytest.approx(
+        pattern_stats
+    )
+
+
+def test_calc_ln_hold_stats():
+    """
+    Chords hit while a long note is held are counted.
+    """
+
+    m = MainaMap(
+        4,
+        [
+            parse.Note(0, 0, 400),
+            parse.Note(1, 100),
+            parse.Note(2, 200),
+            parse.Note(3, 500, 600),
+        ],
+    )
+    ln_hold_stats = calc_ln_hold_stats(m)
+
+    assert ln_hold_stats["LN_RATIO"] == 0.5
+    assert ln_hold_stats["MEAN_HOLD_DURATION"] == 250
+    assert ln_hold_stats["HELD_NOTE_RATIO"] == 0.5
+
+
+def test_calc_4k_pattern_stats(corpus):
+    """
+    The merged pass gives the same hold and release stats as the separate functions.
+    """
+
+    m = corpus[
+        "test_files/LN/Various Artists - 4K LN Dan Courses v2 - Level 2 - (_underjoy) [5th Dan (Marathon)].osu"
+    ]
+    hold_stats, release_stats, merged_stats = calc_4k_pattern_stats(m)
+
+    assert hold_stats == calc_4k_hold_note_pattern_stats(m.hold_notes_dict)
+    assert release_stats == calc_4k_release_note_pattern_stats(
+        m.hold_notes_dict, m.release_notes_dict
+    )
+    assert merged_stats[PatternType.OVERALL] > 0
+
+
+def test_reform_dan(corpus):
+    """
+    A test to check if the dans' difficulty is appropirately calculated
+    """
+
+    all_file_names = get_dan_courses()["reform"]
+
     overall_ss: list[float] = []
     detailed_ss: list[dict[PatternType, float]] = []
     file_names_4k: list[str] = []
 
     for file_name in all_file_names:
-        m = parse.parse_map(file_name)
+        m = corpus[file_name]
 
         if m.key_count != 4:
             raise ValueError("The map is not 4k what?")
@@ -143,28 +310,19 @@ def test_reform_dan():
         )
 
 
-def test_joker_dan():
+def test_joker_dan(corpus):
     """
     A test to check if the dans' difficulty is appropirately calculated
     """
 
-    all_file_names: list[str] = []
-
-    for c in ["I", "II", "III", "IV", "V", "VI", "VII", "PHI", "CHI", "PSI"]:
-        all_file_names.append(
-            f"test_files/jocker/Various Artists - Chordjack Joker Dan ([Crz]Rachel&Ice V) [Joker - {c}].osu"
-        )
-
-    all_file_names.append(
-        "test_files/jocker/Various Artists - Chordjack Joker Dan ([Crz]Rachel&Jhown) [Joker - OMEGA].osu"
-    )
+    all_file_names = get_dan_courses()["joker"]
 
     overall_ss: list[float] = []
     detailed_ss: list[dict[PatternType, float]] = []
     file_names_4k: list[str] = []
 
     for file_name in all_file_names:
-        m = parse.parse_map(file_name)
+        m = corpus[file_name]
 
         if m.key_count != 4:
             raise ValueError("The map is not 4k what?")
@@ -180,29 +338,19 @@ def test_joker_dan():
         {json.dumps(butify_pattern_stats(detailed_ss[i + 1]), indent=4)}"
         )
 
-def test_malody_regular_dan():
+def test_malody_regular_dan(corpus):
     """
     A test to check if the dans' difficulty is appropirately calculated
     """
 
-    all_file_names: list[str] = []
-
-    for i in range(0, 5):
-        all_file_names.append(
-            f"test_files/malody/Various Artists - Malody 4K Regular Dans v3 (Part.1) (Muses) [Regular-{i}].osu"
-        )
-
-    for i in range(5, 11):
-        all_file_names.append(
-            f"test_files/malody/Various Artists - Malody 4K Regular Dans v3 (Part.2) (Muses) [Regular-{i}].osu"
-        )
+    all_file_names = get_dan_courses()["malody_regular"]
 
     overall_ss: list[float] = []
     detailed_ss: list[dict[PatternType, float]] = []
     file_names_4k: list[str] = []
 
     for file_name in all_file_names:
-        m = parse.parse_map(file_name)
+        m = corpus[file_name]
 
         if m.key_count != 4:
             raise ValueError("The map is not 4k what?")
@@ -219,33 +367,19 @@ def test_malody_regular_dan():
         )
 
 
-def test_malody_extra_dan():
+def test_malody_extra_dan(corpus):
     """
     A test to check if the dans' difficulty is appropirately calculated
     """
 
-    all_file_names: list[str] = []
-
-    for i in range(1, 6):
-        all_file_names.append(
-            f"test_files/malody/Various Artists - Malody 4K Extra Dan v3 (Pack 1) ([GS]hina) [Extra-{i} v3].osu"
-        )
-
-    for i in range(6, 10):
-        all_file_names.append(
-            f"test_files/malody/Various Artists - Malody 4K Extra Dan v3 (Pack 2) ([GS]hina) [Extra-{i} v3].osu"
-        )
-
-    all_file_names.append(
-        "test_files/malody/Various Artists - Malody 4K Extra Dan v3 (Pack 2) ([GS]hina) [Ex-Final v3].osu"
-    )
+    all_file_names = get_dan_courses()["malody_extra"]
 
     overall_ss: list[float] = []
     detailed_ss: list[dict[PatternType, float]] = []
     file_names_4k: list[str] = []
 
     for file_name in all_file_names:
-        m = parse.parse_map(file_name)
+        m = corpus[file_name]
 
         if m.key_count != 4:
             raise ValueError("The map is not 4k what?")
@@ -262,28 +396,19 @@ def test_malody_extra_dan():
         )
 
 
-def test_tr1ple_dan():
+def test_tr1ple_dan(corpus):
     """
     A test to check if the dans' difficulty is appropirately calculated
     """
 
-    all_file_names: list[str] = []
-
-    for c in ["ALPHA", "BETA", "GAMMA"]:
-        all_file_names.append(
-            f"test_files/tr1ple/Various Artists - TR1PLE DAN (wonder5193) [Stage ~ {c} ~].osu"
-        )
-
-    all_file_names.append(
-        "test_files/tr1ple/Various Artists - TR1PLE DAN (wonder5193) [Last Stage ~ DELTA ~].osu"
-    )
+    all_file_names = get_dan_courses()["tr1ple"]
 
     overall_ss: list[float] = []
     detailed_ss: list[dict[PatternType, float]] = []
     file_names_4k: list[str] = []
 
     for file_name in all_file_names:
-        m = parse.parse_map(file_name)
+        m = corpus[file_name]
 
         if m.key_count != 4:
             raise ValueError("The map is not 4k what?")
@@ -300,32 +425,19 @@ def test_tr1ple_dan():
         )
 
 
-def test_shoegazor_dan():
+def test_shoegazor_dan(corpus):
     """
     A test to check if the dans' difficulty is appropirately calculated
     """
 
-    all_file_names: list[str] = [
-        r"test_files\shoegazor\Various Artists - 4k 1st dan v2 (Yuudachi-kun) [d-1].osu",
-        r"test_files\shoegazor\Various Artists - 4k 2nd dan v2 (Yuudachi-kun) [d-2].osu",
-        r"test_files\shoegazor\Various Artists - 4k 3rd dan v2 (Yuudachi-kun) [d-3].osu",
-        r"test_files\shoegazor\Various Artists - 4K 4th Dan (Yuudachi-kun) [Dan4].osu",
-        r"test_files\shoegazor\Various Artists - 4K 5th Dan (wjh0133) [dan5].osu",
-        r"test_files\shoegazor\Various Artists - 4K 6th Dan (wjh0133) [dan6].osu",
-        r"test_files\shoegazor\Various Artists - 4K 7th Dan v2 (wjh0133) [dan7].osu",
-        r"test_files\shoegazor\Various Artists - 4K 8th Dan v2 (wjh0133) [dan8].osu",
-        r"test_files\shoegazor\Various Artists - 4K 9th Dan v2 (wjh0133) [dan9].osu",
-        r"test_files\shoegazor\Various Artists - 4K 10th Dan (pikachuuuuu-) [dan10].osu",
-        r"test_files\shoegazor\Various Artists - 4K Luminal v2 (Pikapikapikapi) [Luminal].osu",
-        r"test_files\shoegazor\Various Artists - 4K Tachyon v3 (chicken Little) [Tachyon].osu",
-    ]
+    all_file_names = get_dan_courses()["shoegazor"]
 
     overall_ss: list[float] = []
     detailed_ss: list[dict[PatternType, float]] = []
     file_names_4k: list[str] = []
 
     for file_name in all_file_names:
-        m = parse.parse_map(file_name)
+        m = corpus[file_name]
 
         if m.key_count != 4:
             raise ValueError("The map is not 4k what?")
@@ -343,10 +455,13 @@ def test_shoegazor_dan():
 
 
 if __name__ == "__main__":
-    test_calc_4k_raw_stats_sum()
-    test_reform_dan()
-    test_joker_dan()
-    test_malody_regular_dan()
-    test_malody_extra_dan()  # Fails at Extra2<->Extra3. Gave up.
-    test_tr1ple_dan()
-    test_shoegazor_dan()
+    from conftest import load_corpus
+
+    test_corpus = load_corpus()
+    test_calc_4k_raw_stats_sum(test_corpus)
+    test_reform_dan(test_corpus)
+    test_joker_dan(test_corpus)
+    test_malody_regular_dan(test_corpus)
+    test_malody_extra_dan(test_corpus)  # Fails at Extra2<->Extra3. Gave up.
+    test_tr1ple_dan(test_corpus)
+    test_shoegazor_dan(test_corpus)
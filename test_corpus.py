@@ -0,0 +1,52 @@
+"""
+This module tests functions in corpus.py
+"""
+
+import os
+import shutil
+
+import calc
+from calc import PatternType
+from corpus import CorpusIndex
+
+
+def test_corpus_index(tmp_path):
+    """
+    Only new and changed maps are rated, and the top query filters on OVERALL.
+    """
+    paths = []
+
+    for file_name in ["jump.osu", "hand.osu", "chordjack.osu"]:
+        shutil.copy(f"test_files/{file_name}", tmp_path / file_name)
+        paths.append(str(tmp_path / file_name))
+
+    with CorpusIndex(str(tmp_path / "corpus.sqlite3")) as index:
+        assert index.update(paths, 1)["rated"] == 3
+        assert index.update(paths, 1)["unchanged"] == 3
+
+        os.utime(paths[0], (0, 0))
+        assert index.update(paths, 1)["touched"] == 1
+
+        with open(paths[1], "a", encoding="utf-8") as file:
+            file.write("\n")
+        assert index.update(paths, 1)["rated"] == 1
+
+        row = index.get(paths[2])
+        assert row is not None
+        assert row["key_count"] == 4
+        assert row["OVERALL"] == calc.from_file(paths[2])["OVERALL"]
+
+        top = index.top(PatternType.SPEED_JACK, limit=2)
+        assert len(top) == 2
+        assert top[0]["SPEED_JACK"] >= top[1]["SPEED_JACK"]
+
+        overall = sorted(index.get(path)["OVERALL"] for path in paths)
+        assert len(index.top(PatternType.SPEED_JACK, overall_range=(overall[1], None))) == 2
+
+        os.remove(paths[0])
+        assert index.prune() == 1
+        assert len(index) == 2
+
+        index.remove(paths[1])
+        assert index.get(paths[1]) is None
+        assert len(index) == 1
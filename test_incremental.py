@@ -0,0 +1,52 @@
+"""
+This module tests functions in incremental.py
+"""
+
+import random
+
+import pytest
+
+import parse
+from calc import calc_4k_hold_note_pattern_stats
+from incremental import IncrementalRater
+
+
+def test_incremental_rater():
+    """
+    After random edits, the stats are the same as rating the edited map from scratch.
+    """
+    random.seed(0)
+    m = parse.parse_map("test_files/jump.osu")
+    rater = IncrementalRater(m)
+    last_time = rater.times[-1]
+
+    for i in range(200):
+        if i % 2 == 0:
+            hold_time = random.choice([random.randrange(last_time), random.choice(rater.times)])
+            index = random.randrange(4)
+
+            if index not in rater.chords.get(hold_time, []):
+                rater.add_note(index, hold_time)
+        else:
+            # Edits around the first chords are the tricky ones
+            hold_time = random.choice(rater.times[:6] if i % 3 == 0 else rater.times)
+            rater.remove_note(random.choice(rater.chords[hold_time]), hold_time)
+
+        if i % 20 == 0:
+            assert rater.get_pattern_stats() == pytest.approx(
+                calc_4k_hold_note_pattern_stats(rater.get_hold_notes_dict())
+            )
+
+    assert rater.get_pattern_stats() == pytest.approx(
+        calc_4k_hold_note_pattern_stats(rater.get_hold_notes_dict())
+    )
+
+
+def test_remove_missing_note():
+    """
+    Removing a note which isn't in the map is an error.
+    """
+    m = parse.MainaMap(4, [parse.Note(0, 0), parse.Note(1, 100), parse.Note(2, 200)])
+
+    with pytest.raises(ValueError):
+        IncrementalRater(m).remove_note(3, 100)
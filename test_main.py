@@ -0,0 +1,72 @@
+"""
+This module tests the stdin mode of main.py
+"""
+
+import io
+import json
+
+import pytest
+
+import calc
+import main
+
+
+def read_lines(path: str) -> list[str]:
+    """
+    The lines of a file as sys.stdin would give them
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return file.readlines()
+
+
+def test_iter_stdin_maps():
+    """
+    Paths are yielded one per line, a content goes on until the next content.
+    """
+    content = read_lines("test_files/jump.osu")
+    lines = ["test_files/jump.osu\n", "\n", "missing.osu\n"] + content + content
+
+    items = list(main.iter_stdin_maps(lines))
+
+    assert items == [
+        ("path", "test_files/jump.osu"),
+        ("path", "missing.osu"),
+        ("map", content),
+        ("map", content),
+    ]
+
+
+@pytest.mark.parametrize("workers", [None, 1])
+def test_rate_stdin(workers):
+    """
+    Paths and contents get the stats of calc.from_file, broken maps get an error.
+    """
+    content = read_lines("test_files/jump.osu")
+    lines = ["test_files/jump.osu\n"] + content + ["osu file format v14\n"]
+
+    results = sorted(main.rate_stdin(lines, workers), key=lambda result: result.get("index", -1))
+    expected = calc.from_file("test_files/jump.osu")
+
+    assert [result.get("path") for result in results] == ["test_files/jump.osu", None, None]
+    assert results[0]["stats"] == expected
+    assert results[1] == {"index": 1, "key_count": 4, "stats": expected}
+    assert results[2]["index"] == 2 and "error" in results[2]
+
+
+def test_main_stdin(monkeypatch, capsys):
+    """
+    Every result is printed as one compact JSON line.
+    """
+    monkeypatch.setattr("sys.stdin", io.StringIO("test_files/jump.osu\nmissing.osu\n"))
+
+    main.main(["--stdin"])
+
+    lines = capsys.readouterr().out.splitlines()
+
+    assert len(lines) == 2
+    assert all(line == json.dumps(json.loads(line), separators=(",", ":")) for line in lines)
+    assert json.loads(lines[0])["stats"] == calc.from_file("test_files/jump.osu")
+    assert json.loads(lines[1])["error"]["type"] == "FileNotFoundError"
+
+    with pytest.raises(SystemExit):
+        main.main(["--stdin", "test_files/jump.osu"])
@@ -0,0 +1,65 @@
+"""
+This module tests functions in map_files.py
+"""
+
+import map_files
+
+
+def test_find_map_files():
+    """
+    Directories, globs and .osu files are expanded into .osu files.
+    """
+    from_dir = list(map_files.find_map_files(["test_files/tr1ple"]))
+    from_glob = list(map_files.find_map_files(["test_files/tr1ple/*.osu"]))
+
+    assert len(from_dir) == 4
+    assert from_dir == from_glob
+    assert list(map_files.find_map_files(["test_files/jump.osu"])) == ["test_files/jump.osu"]
+
+
+def test_find_map_files_skips_other_files(tmp_path):
+    """
+    Globs only keep .osu files and directories, unreadable paths are yielded to be reported.
+    """
+    (tmp_path / "song.mp3").write_bytes(b"\xff\xfb\x90\x00")
+    (tmp_path / "map.OSU").write_text("", encoding="utf-8")
+    (tmp_path / "paths.txt").write_text("test_files/jump.osu\nmissing\n", encoding="utf-8")
+    listed = [str(tmp_path / "paths.txt"), str(tmp_path / "song.mp3")]
+
+    assert list(map_files.find_map_files([str(tmp_path / "*")])) == [str(tmp_path / "map.OSU")]
+    assert list(map_files.find_map_files([str(tmp_path)])) == [str(tmp_path / "map.OSU")]
+    assert list(map_files.find_map_files(listed)) == [
+        "test_files/jump.osu",
+        "missing",
+        str(tmp_path / "song.mp3"),
+    ]
+
+
+def test_filter_map_files(tmp_path):
+    """
+    Maps of other modes and key counts are filtered out by their headers.
+    """
+    with open("test_files/jump.osu", "r", encoding="utf-8") as file:
+        content = file.read()
+
+    standard_path = tmp_path / "standard.osu"
+    standard_path.write_text(content.replace("Mode: 3", "Mode: 0"), encoding="utf-8")
+    seven_key_path = tmp_path / "7k.osu"
+    seven_key_path.write_text(content.replace("CircleSize:4", "CircleSize:7"), encoding="utf-8")
+
+    paths = [
+        "test_files/jump.osu",
+        str(standard_path),
+        str(seven_key_path),
+        "test_files/missing.osu",
+    ]
+
+    assert list(map_files.filter_map_files(paths)) == [
+        "test_files/jump.osu",
+        str(seven_key_path),
+        "test_files/missing.osu",
+    ]
+    assert list(map_files.filter_map_files(paths, 4)) == [
+        "test_files/jump.osu",
+        "test_files/missing.osu",
+    ]
@@ -0,0 +1,56 @@
+"""
+This module tests functions in ngrams.py
+"""
+
+from collections import Counter
+
+import parse
+from calc import get_column_mask
+from ngrams import BoundedCounter, calc_ngram_histogram
+
+
+def test_calc_ngram_histogram():
+    """
+    The n-grams of every length are counted in one pass, the same as slicing the chords.
+    """
+    m = parse.parse_map("test_files/jump.osu")
+    masks = [get_column_mask(notes) for notes in m.hold_notes_dict.values()]
+    histogram = calc_ngram_histogram(m.hold_notes_dict, m.key_count, range(4, 9), 1 << 20)
+
+    for n in range(4, 9):
+        expected = Counter(tuple(masks[i : i + n]) for i in range(len(masks) - n + 1))
+        top = histogram.counters[n].most_common(5)
+
+        assert [count for _, count in top] == [count for _, count in expected.most_common(5)]
+        assert [expected[tuple(histogram.get_motif(key, n))] for key, _ in top] == [
+            count for _, count in top
+        ]
+        assert histogram.counters[n].total == len(masks) - n + 1
+
+
+def test_format_motif():
+    """
+    A roll is printed chord by chord.
+    """
+    notes = [parse.Note(index % 4, time * 100) for time, index in enumerate(range(12))]
+    histogram = calc_ngram_histogram(parse.MainaMap(4, notes).hold_notes_dict, 4, [4])
+
+    assert histogram.get_top(4, 1)[0] == {
+        "motif": "#xxx x#xx xx#x xxx#",
+        "count": 3,
+        "density": 3 / 9,
+    }
+
+
+def test_bounded_counter():
+    """
+    The memory is bounded and frequent keys are still found.
+    """
+    counter = BoundedCounter(4)
+
+    for key in [1, 2, 1, 3, 1, 4, 5, 1, 6, 7, 1, 8]:
+        counter.add(key)
+        assert len(counter.counts) <= 4
+
+    assert counter.most_common(1)[0][0] == 1
+    assert counter.most_common(1)[0][1] >= 5 - counter.error
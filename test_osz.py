@@ -0,0 +1,53 @@
+"""
+This module tests functions in osz.py
+"""
+
+import io
+import zipfile
+
+import calc
+import osz
+import parse
+from test_parse import EXAMPLE_MAP
+
+
+def make_osz(with_broken: bool = True) -> bytes:
+    """
+    A beatmap set with a maina, a standard and (optionally) a broken difficulty
+    """
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, "w") as archive:
+        with open("test_files/jump.osu", "rb") as file:
+            archive.writestr("jump.osu", file.read())
+
+        archive.writestr("standard.osu", EXAMPLE_MAP.replace("Mode: 3", "Mode: 0"))
+
+        if with_broken:
+            archive.writestr("broken.osu", EXAMPLE_MAP.replace("CircleSize:4\n", ""))
+
+        archive.writestr("audio.mp3", b"")
+
+    return buffer.getvalue()
+
+
+def test_iter_osz_maps():
+    """
+    Only the maina difficulties are parsed.
+    """
+    maps = dict(osz.iter_osz_maps(make_osz(with_broken=False)))
+    expected = parse.parse_map("test_files/jump.osu").hold_notes_dict
+
+    assert "standard.osu" not in maps
+    assert maps["jump.osu"].hold_notes_dict == expected
+
+
+def test_rate_osz():
+    """
+    Every maina difficulty gets a result, the broken ones get an error instead of stats.
+    """
+    results = {result["path"]: result for result in osz.rate_osz(make_osz())}
+
+    assert set(results) == {"jump.osu", "broken.osu"}
+    assert results["jump.osu"]["stats"] == calc.from_file("test_files/jump.osu")
+    assert results["broken.osu"]["error"]["type"] == "ValueError"
@@ -0,0 +1,154 @@
+"""
+This module tests functions in parse.py
+"""
+
+# pylint: disable=line-too-long
+
+import io
+
+import pytest
+
+import calc
+import columnar
+import parse
+
+EXAMPLE_MAP = """osu file format v14
+
+[General]
+Mode: 3
+
+[Difficulty]
+CircleSize:4
+OverallDifficulty:8
+
+[HitObjects]
+64,192,100,1,0,0:0:0:0:
+448,192,100,128,0,300:0:0:0:0:
+192,192,200,1,0,0:0:0:0:
+
+"""
+
+
+def test_stream_map():
+    """
+    The header is read first and the hit objects are yielded lazily afterwards.
+    """
+    key_count, hit_objects = parse.stream_map(io.StringIO(EXAMPLE_MAP))
+
+    assert key_count == 4
+    assert list(hit_objects) == [(0, 100, None), (3, 100, 300), (1, 200, None)]
+
+
+def test_stream_map_without_key_count():
+    """
+    A map without CircleSize can't be parsed.
+    """
+    with pytest.raises(ValueError):
+        parse.stream_map(io.StringIO(EXAMPLE_MAP.replace("CircleSize:4\n", "")))
+
+
+def test_parse_map():
+    """
+    Notes are grouped by time.
+    """
+    m = parse.parse_map("test_files/jump.osu")
+
+    assert m.key_count == parse.get_key_count("test_files/jump.osu")
+    assert list(m.hold_notes_dict) == sorted(m.hold_notes_dict)
+    assert sum(len(notes) for notes in m.hold_notes_dict.values()) == len(m.notes)
+
+
+def test_parse_map_from_file_objects():
+    """
+    A map is parsed the same from a path, bytes and text or binary file objects.
+    """
+    m = parse.parse_map("test_files/jump.osu")
+
+    with open("test_files/jump.osu", "rb") as file:
+        content = file.read()
+
+    for source in (content, io.BytesIO(content), io.StringIO(content.decode("utf-8"))):
+        assert parse.parse_map(source).hold_notes_dict == m.hold_notes_dict
+
+
+def test_columnar_map():
+    """
+    A map backed by columnar arrays exposes the same dicts and notes.
+    """
+    path = "test_files/LN/Various Artists - 4K LN Dan Courses v2 - Level 1 - (_underjoy) [1st Dan (Marathon)].osu"
+    m = parse.parse_map(path)
+    columnar_m = columnar.parse_columnar_map(path)
+
+    assert columnar_m.key_count == m.key_count
+    assert columnar_m.hold_notes_dict == m.hold_notes_dict
+    assert columnar_m.release_notes_dict == m.release_notes_dict
+    assert columnar_m.columns.chord_count == len(m.hold_notes_dict)
+    assert [
+        (note.index, note.hold_time, note.release_time) for note in columnar_m.notes
+    ] == [(note.index, note.hold_time, note.release_time) for note in m.notes]
+
+
+def test_empty_columnar_notes():
+    """
+    An empty map has no chord.
+    """
+    columns = columnar.ColumnarNotes([], [], [])
+
+    assert columns.chord_count == 0
+    assert len(columns.chord_times) == 0
+    assert not columns.get_hold_notes_dict()
+    assert not columns.get_release_notes_dict()
+
+
+def test_release_index():
+    """
+    The indexed lookup finds the same release as the linear scan.
+    """
+    m = parse.parse_map(
+        "test_files/LN/Various Artists - 4K LN Dan Courses v2 - Level 1 - (_underjoy) [1st Dan (Marathon)].osu"
+    )
+    times = list(m.hold_notes_dict)[::50]
+
+    for index in range(m.key_count):
+        for time in times:
+            assert m.get_next_release_time(index, time) == calc.get_closest_release_time(
+                time, index, m.release_notes_dict
+            )
+
+
+def test_is_held():
+    """
+    A column is held between the hold and the release of a long note.
+    """
+    m = parse.MainaMap(4, [parse.Note(0, 100, 300), parse.Note(1, 200), parse.Note(0, 400)])
+
+    assert not m.is_held(0, 100)
+    assert m.is_held(0, 200)
+    assert not m.is_held(0, 300)
+    assert not m.is_held(0, 400)
+    assert not m.is_held(1, 200)
+
+
+def test_scan_header():
+    """
+    The metadata is read from the header, the hit object count is roughly estimated.
+    """
+    path = "test_files/LN/Various Artists - 4K LN Dan Courses v2 - Level 1 - (_underjoy) [1st Dan (Marathon)].osu"
+    header = parse.scan_header(path)
+
+    assert header.is_mania()
+    assert header.key_count == 4
+    assert header.version == "1st Dan (Marathon)"
+    assert header.title
+
+    with open(path, "r", encoding="utf-8") as file:
+        lines = file.read().split("[HitObjects]")[1].split()
+
+    assert abs(header.hit_object_count - len(lines)) < len(lines) * 0.25
+
+    with open(path, "rb") as file:
+        from_content = parse.scan_header(file.read())
+
+    assert [getattr(from_content, name) for name in parse.MapHeader.__slots__] == [
+        getattr(header, name) for name in parse.MapHeader.__slots__
+    ]
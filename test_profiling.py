@@ -0,0 +1,62 @@
+"""
+This module tests functions in profiling.py
+"""
+
+import profiling
+
+import calc
+
+
+def test_profiler():
+    """
+    Profiling doesn't change the stats and measures every stage.
+    """
+    profiler = profiling.Profiler(trace_allocations=True)
+    stats = calc.from_file("test_files/jump.osu", profiler=profiler)
+    report = profiler.get_report()
+
+    assert stats == calc.from_file("test_files/jump.osu")
+    assert set(report["stages"]) == {
+        "snapshot", "key_count", "parse", "dicts", "classify", "score", "total"
+    }
+    assert all(stage["calls"] == 1 for stage in report["stages"].values())
+    assert report["stages"]["parse"]["peak_bytes"] > 0
+    assert report["counts"]["chords"] == report["counts"]["rows"] + 1
+
+
+def test_nested_stage_peak():
+    """
+    An inner stage doesn't hide the peak of the stage around it.
+    """
+    profiler = profiling.Profiler(trace_allocations=True)
+
+    with profiler.stage("outer"):
+        buffer = bytearray(4 * 1024 * 1024)
+        del buffer
+
+        with profiler.stage("inner"):
+            small = bytearray(1024)
+            del small
+
+    stages = profiler.get_report()["stages"]
+
+    assert stages["outer"]["peak_bytes"] >= 4 * 1024 * 1024
+    assert stages["inner"]["peak_bytes"] < 4 * 1024 * 1024
+    assert not profiler.peak_stack
+
+
+def test_env_profiler(monkeypatch):
+    """
+    MAINA_PROFILE turns the profiler on without changing the calls.
+    """
+    monkeypatch.setattr(profiling, "_ENV_PROFILER", None)
+    monkeypatch.delenv(profiling.PROFILE_ENV_VAR, raising=False)
+
+    assert profiling.get_env_profiler() is None
+
+    monkeypatch.setenv(profiling.PROFILE_ENV_VAR, "1")
+    calc.from_file("test_files/jump.osu")
+    profiler = profiling.get_env_profiler()
+
+    assert profiler is not None
+    assert profiler.get_report()["stages"]["total"]["calls"] == 1
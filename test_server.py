@@ -0,0 +1,78 @@
+"""
+This module tests functions in server.py
+"""
+
+import asyncio
+import json
+
+import calc
+import server
+
+
+async def request(port: int, method: str, path: str, body: bytes = b"") -> tuple[int, object]:
+    """
+    Sends one request and returns (status, JSON body)
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+        + body
+    )
+    response = await reader.read()
+    writer.close()
+
+    head, _, content = response.partition(b"\r\n\r\n")
+
+    return int(head.split()[1]), json.loads(content)
+
+
+def test_server():
+    """
+    The server returns the same stats as calc.from_file and counts every stage.
+    """
+
+    async def run() -> None:
+        service = server.RatingService(1)
+        await service.start()
+        tcp_server = await asyncio.start_server(
+            lambda reader, writer: server.handle_connection(service, reader, writer),
+            "127.0.0.1",
+            0,
+        )
+        port = tcp_server.sockets[0].getsockname()[1]
+
+        try:
+            with open("test_files/jump.osu", "rb") as file:
+                data = file.read()
+
+            assert await request(port, "POST", "/rate", data) == (
+                200,
+                calc.from_file("test_files/jump.osu"),
+            )
+
+            status, results = await request(
+                port, "POST", "/batch", json.dumps({"maps": [data.decode(), "not a map"]}).encode()
+            )
+            assert status == 200
+            assert [("stats" in result, "error" in result) for result in results] == [
+                (True, False),
+                (False, True),
+            ]
+
+            for maps in ("abc", [data.decode(), 1]):
+                status, response = await request(
+                    port, "POST", "/batch", json.dumps({"maps": maps}).encode()
+                )
+                assert status == 400
+                assert response["error"]["type"] == "TypeError"
+
+            status, metrics = await request(port, "GET", "/metrics")
+            assert status == 200
+            assert metrics["queue_depth"] == 0
+            assert metrics["latency"]["total"]["count"] == 3
+        finally:
+            tcp_server.close()
+            service.close()
+
+    asyncio.run(run())
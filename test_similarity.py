@@ -0,0 +1,61 @@
+"""
+This module tests functions in similarity.py
+"""
+
+import numpy as np
+import pytest
+
+import calc
+from similarity import SimilarityIndex, get_stat_vector
+
+PATHS = [f"test_files/{name}.osu" for name in ["jump", "hand", "chordjack", "delay", "delay2"]]
+
+
+def make_index() -> SimilarityIndex:
+    """
+    An index of the maps in PATHS
+    """
+    return SimilarityIndex(
+        PATHS, np.array([get_stat_vector(calc.from_file(path)) for path in PATHS])
+    )
+
+
+def test_query():
+    """
+    A map is the closest to itself, and the scores are the same as computed one by one.
+    """
+    index = make_index()
+    stats = calc.from_file("test_files/hand.osu")
+
+    for metric in ("cosine", "euclidean"):
+        result = index.query(stats, k=3, metric=metric)
+        scores = [score for _, score in result]
+
+        assert result[0][0] == "test_files/hand.osu"
+        assert scores == sorted(scores, reverse=True)
+
+    query = get_stat_vector(stats) / index.scale
+    expected = sorted(
+        (
+            float(np.dot(query, vector) / np.linalg.norm(query) / np.linalg.norm(vector))
+            for vector in index.vectors
+        ),
+        reverse=True,
+    )
+    scores = [score for _, score in index.query(stats, k=len(PATHS))]
+
+    assert scores == pytest.approx(expected, rel=1e-5)
+    assert index.query(stats, metric="euclidean")[0][1] == pytest.approx(0, abs=1e-3)
+
+
+def test_save_load(tmp_path):
+    """
+    A saved index is memory-mapped and answers the same.
+    """
+    index = make_index()
+    index.save(str(tmp_path / "similarity"))
+    loaded = SimilarityIndex.load(str(tmp_path / "similarity"))
+    stats = calc.from_file("test_files/jump.osu")
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.query(stats) == index.query(stats)
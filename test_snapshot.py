@@ -0,0 +1,84 @@
+"""
+This module tests functions in snapshot.py
+"""
+
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+import calc
+import parse
+import snapshot
+
+
+def test_snapshot(tmp_path):
+    """
+    A snapshot gives the same map, backed by the mapped file, until the map changes.
+    """
+    path = str(tmp_path / "jump.osu")
+    shutil.copy("test_files/jump.osu", path)
+
+    assert snapshot.load_snapshot(path) is None
+
+    snapshot.write_snapshot(path)
+    m = snapshot.load_snapshot(path)
+
+    assert m is not None
+    assert m.columns is not None
+    assert isinstance(m.columns.hold_times.base, np.memmap)
+    assert m.hold_notes_dict == parse.parse_map(path).hold_notes_dict
+    assert m.release_notes_dict == parse.parse_map(path).release_notes_dict
+
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("\n")
+
+    assert snapshot.load_snapshot(path) is None
+
+
+def test_from_file_uses_snapshot(tmp_path, monkeypatch):
+    """
+    calc.from_file doesn't parse a map which has an up-to-date snapshot.
+    """
+    path = str(tmp_path / "hand.osu")
+    shutil.copy("test_files/hand.osu", path)
+    stats = calc.from_file(path)
+
+    assert snapshot.write_snapshots([path]) == {"written": 1, "up_to_date": 0, "errors": 0}
+    assert os.path.exists(snapshot.get_snapshot_path(path))
+
+    def fail(*_):
+        raise AssertionError("the map was parsed")
+
+    monkeypatch.setattr(calc, "parse_map", fail)
+
+    assert calc.from_file(path) == pytest.approx(stats)
+
+
+def test_damaged_snapshot(tmp_path):
+    """
+    A truncated snapshot is ignored and the map is parsed instead.
+    """
+    path = str(tmp_path / "jump.osu")
+    shutil.copy("test_files/jump.osu", path)
+    snapshot_path = snapshot.write_snapshot(path)
+    os.truncate(snapshot_path, os.path.getsize(snapshot_path) - 4)
+
+    assert snapshot.load_snapshot(path) is None
+    assert calc.from_file(path) == calc.from_file("test_files/jump.osu")
+
+
+def test_from_file_without_numpy(monkeypatch):
+    """
+    Without numpy there are no snapshots, maps are still rated.
+    """
+    monkeypatch.setitem(sys.modules, "snapshot", None)
+    calc.get_snapshot_loader.cache_clear()
+
+    try:
+        assert calc.get_snapshot_loader() is None
+        assert calc.from_file("test_files/jump.osu")["OVERALL"] > 0
+    finally:
+        calc.get_snapshot_loader.cache_clear()
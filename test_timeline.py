@@ -0,0 +1,80 @@
+"""
+This module tests functions in timeline.py
+"""
+
+import pytest
+
+import parse
+from calc import PatternType, calc_4k_hold_note_pattern_stats
+from timeline import calc_4k_strain_timeline
+
+
+def test_strain_timeline():
+    """
+    A window covering the whole map is close to the whole map stats,
+    and overlapping windows don't lose any row.
+    """
+    hold_notes_dict = parse.parse_map("test_files/jump.osu").hold_notes_dict
+    overall = calc_4k_hold_note_pattern_stats(hold_notes_dict)[PatternType.OVERALL]
+
+    whole = calc_4k_strain_timeline(hold_notes_dict, window=10**9)
+    assert len(whole) == 1
+    assert whole.get_window(0)[PatternType.OVERALL] == pytest.approx(overall, rel=0.01)
+
+    timeline = calc_4k_strain_timeline(hold_notes_dict, window=2000, step=500)
+    values = timeline.get_values()
+    assert list(timeline.starts) == sorted(timeline.starts)
+    assert timeline.get_peak()[1] == max(values)
+    assert min(values) <= timeline.get_percentile(50) <= max(values)
+
+    by_chords = calc_4k_strain_timeline(hold_notes_dict, window=100, by_chords=True)
+    assert len(by_chords) == (len(hold_notes_dict) - 2 + 99) // 100
+
+
+@pytest.mark.parametrize("window, by_chords", [(300, False), (2, True)])
+def test_strain_timeline_step_over_window(window, by_chords):
+    """
+    With step > window, the rows between two windows are left out:
+    every window is the same as the window with the same start without a gap.
+    """
+    hold_notes_dict = parse.parse_map("test_files/jump.osu").hold_notes_dict
+
+    gaps = calc_4k_strain_timeline(hold_notes_dict, window, window * 5, by_chords)
+    no_gaps = calc_4k_strain_timeline(hold_notes_dict, window, window, by_chords)
+    no_gap_windows = dict(zip(no_gaps.starts, range(len(no_gaps))))
+
+    assert len(gaps) > 1
+
+    for i, start in enumerate(gaps.starts):
+        assert gaps.get_window(i) == no_gaps.get_window(no_gap_windows[start])
+
+
+def test_empty_strain_timeline():
+    """
+    A map with less than three chords has no window, its summary is all 0.
+    """
+    timeline = calc_4k_strain_timeline({0: [0], 100: [1]})
+
+    assert len(timeline) == 0
+    assert timeline.get_summary()[PatternType.OVERALL.name] == {
+        "peak": 0.0, "p50": 0.0, "p90": 0.0, "p95": 0.0, "p99": 0.0
+    }
+
+    with pytest.raises(ValueError):
+        timeline.get_peak()
+
+
+def test_n_key_strain_timeline():
+    """
+    Higher key modes are classified with their own columns:
+    in 7k, the middle column 3 makes a 0-3 trill half jump trill.
+    """
+    notes = [parse.Note(column, i * 100) for i, column in enumerate([0, 3] * 10)]
+    hold_notes_dict = parse.MainaMap(7, notes).hold_notes_dict
+
+    four_key = calc_4k_strain_timeline(hold_notes_dict, window=10**9).get_window(0)
+    seven_key = calc_4k_strain_timeline(hold_notes_dict, window=10**9, key_count=7).get_window(0)
+
+    assert four_key[PatternType.JUMP_TRILL] == 0
+    assert seven_key[PatternType.JUMP_TRILL] > 0
+    assert seven_key[PatternType.SPLIT_TRILL] > 0
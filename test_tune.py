@@ -0,0 +1,50 @@
+"""
+This module tests functions in tune.py
+"""
+
+import numpy as np
+import pytest
+
+import calc
+import parse
+from calc import HOLD_NOTE_PATTERN_WEIGHTS, PatternType
+from tune import WeightTuner, get_dan_courses, get_weight_vector
+
+
+def make_tuner(cache_path: str | None = None) -> WeightTuner:
+    """
+    A tuner over the tr1ple course only
+    """
+    return WeightTuner({"tr1ple": get_dan_courses()["tr1ple"]}, cache_path)
+
+
+def test_overall_is_linear_in_weights():
+    """
+    The unweighted stats times the weights give the OVERALL of calc.
+    """
+    tuner = make_tuner()
+    overall = tuner.get_overall(get_weight_vector(HOLD_NOTE_PATTERN_WEIGHTS))
+
+    for path, map_overall in zip(tuner.paths, overall):
+        hold_notes_dict = parse.parse_map(path).hold_notes_dict
+
+        assert map_overall == pytest.approx(
+            calc.calc_4k_hold_note_pattern_stats(hold_notes_dict)[PatternType.OVERALL]
+        )
+
+
+def test_count_violations(tmp_path):
+    """
+    Many weight vectors are evaluated at once, the same as one by one, and the matrix is cached.
+    """
+    tuner = make_tuner(str(tmp_path / "tune.npz"))
+    weights = get_weight_vector(HOLD_NOTE_PATTERN_WEIGHTS) * np.random.default_rng(0).uniform(
+        0.2, 5, (64, 1)
+    )
+    weights[0] = -get_weight_vector(HOLD_NOTE_PATTERN_WEIGHTS)
+
+    assert tuner.count_violations(weights).tolist() == [
+        len(tuner.get_violated_pairs(row)) for row in weights
+    ]
+    assert tuner.count_violations(weights)[0] > 0
+    assert np.array_equal(make_tuner(str(tmp_path / "tune.npz")).stats, tuner.stats)
@@ -0,0 +1,92 @@
+"""
+This module tests functions in watch.py
+"""
+
+import os
+import shutil
+
+import pytest
+
+import calc
+from watch import MapWatcher
+
+
+def test_map_watcher(tmp_path):
+    """
+    New, edited and deleted maps are reported once they stop changing,
+    and edits of a warm map give the same stats as rating it from scratch.
+    """
+    jump_path = str(tmp_path / "jump.osu")
+    hand_path = str(tmp_path / "hand.osu")
+    shutil.copy("test_files/jump.osu", jump_path)
+    watcher = MapWatcher([str(tmp_path)], debounce=0.5)
+
+    assert not list(watcher.step(0))
+
+    shutil.copy("test_files/hand.osu", hand_path)
+
+    assert not list(watcher.step(1))
+    assert [result["path"] for result in watcher.step(2)] == [hand_path]
+
+    rater = None
+
+    for i, hold_time in enumerate([1000, 1001, 50000]):
+        with open(jump_path, "a", encoding="utf-8") as file:
+            file.write(f"\n{64 + 128 * i},192,{hold_time},1,0,0:0:0:0:\n")
+
+        list(watcher.step(3 + i * 2))
+        (result,) = watcher.step(4 + i * 2)
+
+        # The map is parsed by the first edit, the next ones only update it
+        assert rater is None or watcher.warm[jump_path].rater is rater
+        rater = watcher.warm[jump_path].rater
+        assert result["stats"] == pytest.approx(calc.from_file(jump_path))
+
+    os.remove(hand_path)
+
+    assert list(watcher.step(10)) == [{"path": hand_path, "deleted": True}]
+
+
+def test_map_watcher_edits(tmp_path):
+    """
+    Moved, edited and removed hit object lines of a warm map are applied,
+    a new map deleted before the debounce ends is forgotten.
+    """
+    path = str(tmp_path / "hand.osu")
+    shutil.copy("test_files/hand.osu", path)
+    watcher = MapWatcher([str(tmp_path)], debounce=0)
+    list(watcher.step(0))
+
+    with open(path, "r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+
+    start = lines.index("[HitObjects]") + 1
+    rater = None
+    edits = [
+        lines[:start] + [lines[start + 1], lines[start]] + lines[start + 2 :],
+        lines[: start + 3]
+        + ["448,192,99999,1,0,0:0:0:0:"]
+        + lines[start + 4 : start + 6]
+        + lines[start + 7 :],
+        lines[: start + 3] + lines[start + 5 :],
+    ]
+
+    for i, edit in enumerate(edits):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("\n".join(edit) + "\n")
+
+        os.utime(path, ns=(i, i))
+        (result,) = watcher.step(1 + i)
+
+        assert result["stats"] == pytest.approx(calc.from_file(path))
+        assert rater is None or watcher.warm[path].rater is rater
+        rater = watcher.warm[path].rater
+
+    new_path = str(tmp_path / "jump.osu")
+    shutil.copy("test_files/jump.osu", new_path)
+    watcher.debounce = 10
+    list(watcher.step(10))
+    os.remove(new_path)
+
+    assert not list(watcher.step(30))
+    assert new_path not in watcher.pending
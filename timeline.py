@@ -0,0 +1,182 @@
+"""
+This module calculates pattern stats per window of a map (a strain timeline),
+so the hardest section of a marathon isn't averaged away by the rest of it.
+"""
+# pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+
+from array import array
+from collections import deque
+
+from calc import (
+    HOLD_NOTE_PATTERN_WEIGHTS,
+    PatternStatsAccumulator,
+    PatternType,
+    get_point_from_hold_note_time_diff,
+)
+
+PATTERN_COUNT = len(PatternType)
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+class StrainTimeline:
+    """
+    Pattern stats of each window, stored flat:
+    values[i * PATTERN_COUNT + pattern.value] is the stat of the i-th window.
+    A window starts at starts[i] (ms, or row index with by_chords).
+    """
+
+    def __init__(self, window: int, step: int, by_chords: bool) -> None:
+        self.window = window
+        self.step = step
+        self.by_chords = by_chords
+        self.starts = array("q")
+        self.values = array("d")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def append(self, start: int, window_stats: list[float]) -> None:
+        """
+        Adds the stats of the next window (ordered as PatternType)
+        """
+        self.starts.append(start)
+        self.values.extend(window_stats)
+
+    def get_window(self, i: int) -> dict[PatternType, float]:
+        """
+        The stats of the i-th window
+        """
+        return {
+            pattern: self.values[i * PATTERN_COUNT + pattern.value] for pattern in PatternType
+        }
+
+    def get_values(self, pattern: PatternType = PatternType.OVERALL) -> array:
+        """
+        The stat of every window for a pattern
+        """
+        return self.values[pattern.value :: PATTERN_COUNT]
+
+    def get_peak(self, pattern: PatternType = PatternType.OVERALL) -> tuple[int, float]:
+        """
+        (start, stat) of the hardest window
+        """
+        if not self:
+            raise ValueError("The timeline has no window, the map has less than three chords.")
+
+        values = self.get_values(pattern)
+        i = max(range(len(values)), key=values.__getitem__)
+
+        return self.starts[i], values[i]
+
+    def get_percentile(
+        self, percentile: float, pattern: PatternType = PatternType.OVERALL
+    ) -> float:
+        """
+        Linearly interpolated percentile (0 - 100) of the stats of the windows,
+        0 without any window
+        """
+        values = sorted(self.get_values(pattern))
+
+        if not values:
+            return 0.0
+
+        position = (len(values) - 1) * percentile / 100
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    def get_summary(
+        self, percentiles: tuple[float, ...] = DEFAULT_PERCENTILES
+    ) -> dict[str, dict[str, float]]:
+        """
+        {pattern name: {"peak", "p50", ...}}, all 0 without any window
+        """
+        summary: dict[str, dict[str, float]] = {}
+
+        for pattern in PatternType:
+            summary[pattern.name] = {"peak": self.get_peak(pattern)[1] if self else 0.0}
+
+            for percentile in percentiles:
+                summary[pattern.name][f"p{percentile:g}"] = self.get_percentile(percentile, pattern)
+
+        return summary
+
+
+def calc_4k_strain_timeline(
+    hold_notes_dict: dict[int, list[int]],
+    window: int = 400,
+    step: int | None = None,
+    by_chords: bool = False,
+    pattern_weights: dict[PatternType, float] | None = None,
+    key_count: int = 4,
+) -> StrainTimeline:
+    """
+    Pattern stats of every window of the map in one pass, with a sliding accumulator.
+    window, step : ms, or rows with by_chords (step defaults to window, no overlap)
+    A window stat is the weighted points of its rows divided by its row count,
+    the same as calc_hold_note_pattern_stats does for the whole map.
+    """
+    if window <= 0 or (step is not None and step <= 0):
+        raise ValueError("window and step must be positive.")
+
+    step = step or window
+    pattern_weights = pattern_weights or HOLD_NOTE_PATTERN_WEIGHTS
+    timeline = StrainTimeline(window, step, by_chords)
+    accumulator = PatternStatsAccumulator(pattern_weights, key_count)
+
+    # (position, pattern index, weighted point) of the rows in the current window
+    rows: deque[tuple[int, int, float]] = deque()
+    sums = [0.0] * PATTERN_COUNT
+    window_start: int | None = None
+    row_index = 0
+
+    def emit() -> None:
+        assert window_start is not None
+
+        window_stats = [value / len(rows) for value in sums] if rows else [0.0] * PATTERN_COUNT
+        window_stats[PatternType.OVERALL.value] = sum(window_stats)
+        timeline.append(window_start, window_stats)
+
+    def slide() -> None:
+        nonlocal window_start
+
+        assert window_start is not None
+        window_start += step
+
+        while rows and rows[0][0] < window_start:
+            _, pattern_index, point = rows.popleft()
+            sums[pattern_index] -= point
+
+        if not rows:
+            sums[:] = [0.0] * PATTERN_COUNT
+
+    for time, notes in hold_notes_dict.items():
+        row = accumulator.classify(time, notes)
+
+        if row is None:
+            continue
+
+        pattern_type, time_diff = row
+        position = row_index if by_chords else time
+        row_index += 1
+
+        if window_start is None:
+            window_start = position
+
+        while position >= window_start + window:
+            emit()
+            slide()
+
+        # With step > window, the rows between two windows are in none of them
+        if position < window_start:
+            continue
+
+        point = get_point_from_hold_note_time_diff(time_diff) * pattern_weights[pattern_type]
+        rows.append((position, pattern_type.value, point))
+        sums[pattern_type.value] += point
+
+    if window_start is not None:
+        emit()
+
+    return timeline
@@ -0,0 +1,252 @@
+"""
+This module tunes HOLD_NOTE_PATTERN_WEIGHTS against the dan courses of test_files:
+every course has to get a higher OVERALL from one dan to the next.
+
+OVERALL is linear in the weights, so the unweighted stats of each map are calculated once
+(and cached), and a weight vector is evaluated with a matrix-vector product.
+
+python tune.py --candidates 10000 --spread 0.2
+"""
+
+import argparse
+import os
+from collections.abc import Iterable
+
+import numpy as np
+
+import calc
+from calc import HOLD_NOTE_PATTERN_WEIGHTS, PatternStatsAccumulator, PatternType
+from parse import parse_map
+
+WEIGHTED_PATTERNS = [pattern for pattern in PatternType if pattern != PatternType.OVERALL]
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "maina-map-pattern-stats", "tune.npz"
+)
+
+
+def get_dan_courses() -> dict[str, list[str]]:
+    """
+    The dan courses of test_files, from the easiest dan to the hardest.
+    The dan ordering tests of test_calc.py check the same courses.
+    """
+    reform = "test_files/reform/Various Artists - Dan ~ REFORM ~ {} [~ {} ~ (Marathon)].osu"
+    joker = "test_files/jocker/Various Artists - Chordjack Joker Dan ({}) [Joker - {}].osu"
+    malody_regular = (
+        "test_files/malody/Various Artists - Malody 4K Regular Dans v3 (Part.{}) (Muses) "
+        "[Regular-{}].osu"
+    )
+    malody_extra = (
+        "test_files/malody/Various Artists - Malody 4K Extra Dan v3 (Pack {}) ([GS]hina) "
+        "[{} v3].osu"
+    )
+    tr1ple = "test_files/tr1ple/Various Artists - TR1PLE DAN (wonder5193) [{}].osu"
+    shoegazor = "test_files/shoegazor/Various Artists - {}.osu"
+
+    return {
+        "reform": [
+            reform.format("1st Pack v2 (DDMythical)", dan)
+            for dan in ["1st", "2nd", "3rd", "4th", "5th", "6th"]
+        ]
+        + [reform.format("2nd Pack (DDMythical)", f"{i}th") for i in range(7, 11)]
+        + [
+            reform.format("2nd Pack (DDMythical)", f"EXTRA-{c}")
+            for c in ["ALPHA", "BETA", "GAMMA", "DELTA", "EPSILON"]
+        ],
+        "joker": [
+            joker.format("[Crz]Rachel&Ice V", c)
+            for c in ["I", "II", "III", "IV", "V", "VI", "VII", "PHI", "CHI", "PSI"]
+        ]
+        + [joker.format("[Crz]Rachel&Jhown", "OMEGA")],
+        "malody_regular": [malody_regular.format(1, i) for i in range(0, 5)]
+        + [malody_regular.format(2, i) for i in range(5, 11)],
+        "malody_extra": [malody_extra.format(1, f"Extra-{i}") for i in range(1, 6)]
+        + [malody_extra.format(2, f"Extra-{i}") for i in range(6, 10)]
+        + [malody_extra.format(2, "Ex-Final")],
+        "tr1ple": [tr1ple.format(f"Stage ~ {c} ~") for c in ["ALPHA", "BETA", "GAMMA"]]
+        + [tr1ple.format("Last Stage ~ DELTA ~")],
+        "shoegazor": [
+            shoegazor.format(name)
+            for name in [
+                "4k 1st dan v2 (Yuudachi-kun) [d-1]",
+                "4k 2nd dan v2 (Yuudachi-kun) [d-2]",
+                "4k 3rd dan v2 (Yuudachi-kun) [d-3]",
+                "4K 4th Dan (Yuudachi-kun) [Dan4]",
+                "4K 5th Dan (wjh0133) [dan5]",
+                "4K 6th Dan (wjh0133) [dan6]",
+                "4K 7th Dan v2 (wjh0133) [dan7]",
+                "4K 8th Dan v2 (wjh0133) [dan8]",
+                "4K 9th Dan v2 (wjh0133) [dan9]",
+                "4K 10th Dan (pikachuuuuu-) [dan10]",
+                "4K Luminal v2 (Pikapikapikapi) [Luminal]",
+                "4K Tachyon v3 (chicken Little) [Tachyon]",
+            ]
+        ],
+    }
+
+
+def get_weight_vector(pattern_weights: dict[PatternType, float]) -> np.ndarray:
+    """
+    The weights ordered as WEIGHTED_PATTERNS
+    """
+    return np.array([pattern_weights[pattern] for pattern in WEIGHTED_PATTERNS])
+
+
+def calc_unweighted_stats(path: str) -> np.ndarray:
+    """
+    The hold note stats of a map with every weight at 1, ordered as WEIGHTED_PATTERNS.
+    Its dot product with a weight vector is the OVERALL of calc_4k_hold_note_pattern_stats.
+    """
+    accumulator = PatternStatsAccumulator({pattern: 1.0 for pattern in PatternType})
+
+    for time, notes in parse_map(path).hold_notes_dict.items():
+        accumulator.add(time, notes)
+
+    pattern_stats = accumulator.get_pattern_stats()
+
+    return np.array([pattern_stats[pattern] for pattern in WEIGHTED_PATTERNS])
+
+
+class WeightTuner:
+    """
+    stats[i] is the unweighted stat vector of paths[i],
+    pairs are the (easier, harder) map indexes of every two consecutive dans
+    """
+
+    def __init__(self, courses: dict[str, list[str]], cache_path: str | None = None) -> None:
+        self.courses = courses
+        self.paths = sorted({path for paths in courses.values() for path in paths})
+        self.stats = self.__load_stats(cache_path)
+
+        indexes = {path: i for i, path in enumerate(self.paths)}
+        pairs = [
+            (indexes[easier], indexes[harder])
+            for paths in courses.values()
+            for easier, harder in zip(paths, paths[1:])
+        ]
+        self.easier = np.array([easier for easier, _ in pairs], dtype=np.intp)
+        self.harder = np.array([harder for _, harder in pairs], dtype=np.intp)
+
+    def __load_stats(self, cache_path: str | None) -> np.ndarray:
+        """
+        Reuses the cached matrix if it was calculated for the same maps and classification.
+        The weights aren't part of the cache key, the stats don't depend on them.
+        """
+        version = calc.get_algorithm_version(include_weights=False)
+
+        if cache_path is not None and os.path.exists(cache_path):
+            cached = np.load(cache_path)
+
+            if str(cached["version"]) == version and cached["paths"].tolist() == self.paths:
+                return cached["stats"]
+
+        stats = np.array([calc_unweighted_stats(path) for path in self.paths])
+
+        if cache_path is not None:
+            if os.path.dirname(cache_path):
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+            np.savez(cache_path, version=version, paths=np.array(self.paths), stats=stats)
+
+        return stats
+
+    def get_overall(self, weights: np.ndarray) -> np.ndarray:
+        """
+        OVERALL of every map for one (patterns,) or many (candidates, patterns) weight vectors
+        """
+        return weights @ self.stats.T
+
+    def count_violations(self, weights: np.ndarray) -> np.ndarray:
+        """
+        Number of dan pairs whose harder dan doesn't get a higher OVERALL,
+        for every row of a (candidates, patterns) weight matrix
+        """
+        overall = self.get_overall(np.atleast_2d(weights))
+
+        return np.count_nonzero(overall[:, self.easier] >= overall[:, self.harder], axis=1)
+
+    def get_violated_pairs(self, weights: np.ndarray) -> list[tuple[str, str, float, float]]:
+        """
+        (easier dan, harder dan, OVERALL of the easier, OVERALL of the harder) of the violated pairs
+        """
+        overall = self.get_overall(weights)
+
+        return [
+            (self.paths[easier], self.paths[harder], float(overall[easier]), float(overall[harder]))
+            for easier, harder in zip(self.easier, self.harder)
+            if overall[easier] >= overall[harder]
+        ]
+
+    def search(
+        self,
+        weights: np.ndarray,
+        candidates: int,
+        spread: float,
+        batch_size: int = 4096,
+        seed: int | None = None,
+    ) -> tuple[np.ndarray, int]:
+        """
+        Random search around weights: each candidate multiplies every weight by
+        exp(normal(0, spread)). Returns (the best weights, their violation count).
+        """
+        rng = np.random.default_rng(seed)
+        best_weights = weights
+        best_violations = int(self.count_violations(weights)[0])
+
+        for start in range(0, candidates, batch_size):
+            size = min(batch_size, candidates - start)
+            batch = best_weights * np.exp(rng.normal(0, spread, (size, len(WEIGHTED_PATTERNS))))
+            violations = self.count_violations(batch)
+            best = int(np.argmin(violations))
+
+            if violations[best] < best_violations:
+                best_weights, best_violations = batch[best], int(violations[best])
+
+        return best_weights, best_violations
+
+
+def print_violated_pairs(pairs: Iterable[tuple[str, str, float, float]]) -> None:
+    """
+    Prints the violated pairs, one per line
+    """
+    for easier, harder, easier_overall, harder_overall in pairs:
+        print(
+            f"  {easier_overall:.2f} ({os.path.basename(easier)}) >= "
+            f"{harder_overall:.2f} ({os.path.basename(harder)})"
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Entry point of the command line
+    """
+    arg_parser = argparse.ArgumentParser(description="Tunes the hold note pattern weights.")
+    arg_parser.add_argument("--candidates", type=int, default=10000)
+    arg_parser.add_argument(
+        "--spread", type=float, default=0.2, help="std of the log of the factors"
+    )
+    arg_parser.add_argument("--seed", type=int, default=None)
+    arg_parser.add_argument(
+        "--cache", default=DEFAULT_CACHE_PATH, help="cache of the unweighted stats"
+    )
+    args = arg_parser.parse_args(argv)
+
+    tuner = WeightTuner(get_dan_courses(), args.cache)
+    current_weights = get_weight_vector(HOLD_NOTE_PATTERN_WEIGHTS)
+    current_pairs = tuner.get_violated_pairs(current_weights)
+
+    print(f"current weights: {len(current_pairs)} / {len(tuner.easier)} violated pairs")
+    print_violated_pairs(current_pairs)
+
+    best_weights, best_violations = tuner.search(
+        current_weights, args.candidates, args.spread, seed=args.seed
+    )
+
+    print(f"best weights: {best_violations} / {len(tuner.easier)} violated pairs")
+    for pattern, weight in zip(WEIGHTED_PATTERNS, best_weights):
+        print(f"  PatternType.{pattern.name}: {weight:.4g},")
+    print_violated_pairs(tuner.get_violated_pairs(best_weights))
+
+
+if __name__ == "__main__":
+    main()
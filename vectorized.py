@@ -0,0 +1,417 @@
+"""
+This module calculates the same pattern stats as calc.py with numpy array operations.
+Every chord is encoded as a bitmask of its columns (#x#x -> 0b0101),
+so all the rows of a map are classified at once instead of one by one.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+from calc import (
+    DUMMY_CHORD,
+    HOLD_NOTE_PATTERN_WEIGHTS,
+    RELEASE_NOTE_PATTERN_WEIGHTS,
+    PatternType,
+    butify_pattern_stats,
+    get_hand_masks,
+    get_inner_mask,
+    get_pattern_lookup,
+    get_point_from_hold_note_time_diff,
+)
+from columnar import ColumnarNotes, parse_columnar_map
+
+# Bigger 4k chords (and chords with two notes on a column) are left to calc.get_pattern_type
+MAX_MASK_CHORD_SIZE = 4
+
+# Columns packed in the codes of a chord (6 bits each in an int64)
+MAX_CODE_CHORD_SIZE = 10
+
+# Marks the rows the masks can't classify
+NO_PATTERN = -1
+
+
+def get_chord_masks(
+    columns: np.ndarray, chord_offsets: np.ndarray, max_chord_size: int = MAX_MASK_CHORD_SIZE
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (masks, codes, is_valid) of every chord.
+    calc.get_pattern_type compares chords as lists, so codes also keeps the order of the columns.
+    is_valid is False for the chords a mask can't represent (or bigger than max_chord_size).
+    """
+    starts = chord_offsets[:-1]
+    sizes = np.diff(chord_offsets)
+    columns = columns.astype(np.int64)
+    in_range = (columns >= 0) & (columns < 62)
+    bits = np.where(in_range, columns, 0)
+
+    masks = np.bitwise_or.reduceat(np.left_shift(1, bits), starts)
+    positions = np.arange(len(columns)) - np.repeat(starts, sizes)
+    codes = np.add.reduceat(
+        np.left_shift(bits + 1, np.minimum(positions, max_chord_size) * 6), starts
+    )
+    is_valid = (
+        np.logical_and.reduceat(in_range, starts)
+        & (sizes <= max_chord_size)
+        & (get_popcount(masks) == sizes)
+    )
+
+    return masks, codes, is_valid
+
+
+def get_popcount(masks: np.ndarray) -> np.ndarray:
+    """
+    The number of columns in each mask
+    """
+    counts = np.zeros_like(masks)
+
+    while masks.any():
+        counts += masks & 1
+        masks = masks >> 1
+
+    return counts
+
+
+def is_consecutive_mask(masks: np.ndarray) -> np.ndarray:
+    """
+    Mask version of calc.is_consecutive
+    """
+    lowest_bit = masks & -masks
+    return ((masks + lowest_bit) & masks) == 0
+
+
+def get_jack_patterns(lower: np.ndarray, chord_jack: PatternType) -> np.ndarray:
+    """
+    SPEED_JACK where the lower chord is a single note, chord_jack elsewhere
+    """
+    return np.where(get_popcount(lower) == 1, PatternType.SPEED_JACK.value, chord_jack.value)
+
+
+def is_one_hand_jump(masks: np.ndarray, key_count: int) -> np.ndarray:
+    """
+    True for the jumps (two consecutive columns) played by one hand
+    """
+    left_hand, right_hand = get_hand_masks(key_count)
+
+    return (
+        (get_popcount(masks) == 2)
+        & is_consecutive_mask(masks)
+        & (((masks & left_hand) == masks) | ((masks & right_hand) == masks))
+    )
+
+
+def classify_single_rows(
+    masks2: np.ndarray, overlap: np.ndarray, is_trill: np.ndarray, key_count: int
+) -> np.ndarray:
+    """
+    The patterns of the rows whose higher chord is a single note
+    (is_trill : the third chord is the first one again)
+    """
+    return np.select(
+        [overlap, is_trill],
+        [
+            PatternType.SPEED_JACK.value,
+            np.where(
+                (masks2 & get_inner_mask(key_count)) != 0,
+                PatternType.JUMP_TRILL.value,
+                PatternType.SPLIT_TRILL.value,
+            ),
+        ],
+        PatternType.SINGLE_STREAM.value,
+    )
+
+
+def classify_triples(
+    masks: tuple[np.ndarray, np.ndarray, np.ndarray],
+    same12: np.ndarray,
+    same13: np.ndarray,
+    key_count: int = 4,
+) -> np.ndarray:
+    """
+    Mask version of calc.get_pattern_type_from_masks, returns PatternType values.
+    masks are the masks of the first, second and third chord of every row,
+    same12, same13 are True where the chords are equal as lists.
+    """
+    masks1, masks2, masks3 = masks
+    first_is_higher = get_popcount(masks1) > get_popcount(masks2)
+    higher = np.where(first_is_higher, masks1, masks2)
+    lower = np.where(first_is_higher, masks2, masks1)
+    higher_size = get_popcount(higher)
+    overlap = (higher & lower) != 0
+    third_is_single = get_popcount(masks3) == 1
+    jack = get_jack_patterns(lower, PatternType.LIGHT_CHORD_JACK)
+
+    broken_jump = np.select(
+        [
+            overlap,
+            (first_is_higher | same12) & third_is_single & ((masks3 & lower) == 0),
+            ~first_is_higher & third_is_single & ((masks3 & higher) == 0),
+            same13,
+        ],
+        [
+            jack,
+            PatternType.SINGLE_STREAM.value,
+            PatternType.SINGLE_STREAM.value,
+            PatternType.SPLIT_TRILL.value,
+        ],
+        PatternType.JUMP_STREAM.value,
+    )
+
+    return np.select(
+        [
+            higher_size == 1,
+            (higher_size == 2) & is_consecutive_mask(higher),
+            higher_size == 2,
+            higher_size == 3,
+            higher_size >= 4,
+        ],
+        [
+            classify_single_rows(masks2, overlap, same13 & third_is_single, key_count),
+            np.select(
+                [overlap, same13],
+                [jack, PatternType.JUMP_TRILL.value],
+                PatternType.JUMP_STREAM.value,
+            ),
+            broken_jump,
+            np.where(
+                overlap,
+                get_jack_patterns(lower, PatternType.DENSE_CHORD_JACK),
+                PatternType.HAND_STREAM.value,
+            ),
+            np.where(
+                is_one_hand_jump(lower, key_count),
+                PatternType.SPEED_JACK.value,
+                PatternType.DENSE_CHORD_JACK.value,
+            ),
+        ],
+        NO_PATTERN,
+    )
+
+
+def get_rows(chord_times: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (first chords, second chords, third chords, time_diffs) of the rows
+    calc_hold_note_pattern_stats walks, including its quirks (the first two chords
+    are swapped and the last chord is classified once more against a dummy chord,
+    whose index is the chord count).
+    """
+    chord_count = len(chord_times)
+    last = chord_count - 1
+    cur = np.arange(2, chord_count + 1)
+    prev = np.append(np.arange(1, last), last)
+    prev_prev = np.arange(0, chord_count - 1)
+    time_diffs = np.append(
+        chord_times[2:] - chord_times[1:-1], chord_times[last] - chord_times[last - 1]
+    )
+
+    if chord_count > 2:
+        prev_prev[0], prev[0] = 1, 0
+        time_diffs[0] = chord_times[2] - chord_times[0]
+        prev_prev[-1] = last
+    if chord_count > 3:
+        prev_prev[1] = 0
+
+    return prev_prev, prev, cur, time_diffs
+
+
+def get_chord(columns: np.ndarray, chord_offsets: np.ndarray, i: int) -> list[int]:
+    """
+    The columns of the i-th chord, the dummy chord after the last chord
+    """
+    if i == len(chord_offsets) - 1:
+        return DUMMY_CHORD
+
+    return columns[chord_offsets[i] : chord_offsets[i + 1]].tolist()
+
+
+def lookup_rows(
+    triples: tuple[np.ndarray, np.ndarray, np.ndarray],
+    columns: np.ndarray,
+    chord_offsets: np.ndarray,
+    key_count: int,
+) -> list[int]:
+    """
+    The patterns of rows (indexes of their first, second and third chords)
+    looked up chord by chord, the same as calc.PatternStatsAccumulator
+    """
+    get_mask, lookup = get_pattern_lookup(key_count)
+    patterns: list[int] = []
+
+    for i, j, k in zip(*(chords.tolist() for chords in triples)):
+        chord1, chord2, chord3 = (get_chord(columns, chord_offsets, n) for n in (i, j, k))
+        patterns.append(
+            lookup(
+                chord1, get_mask(chord1), chord2, get_mask(chord2), chord3, get_mask(chord3)
+            ).value
+        )
+
+    return patterns
+
+
+def get_row_patterns(
+    times: np.ndarray, columns: np.ndarray, chord_offsets: np.ndarray, key_count: int = 4
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (patterns, time_diffs) of the rows of get_rows.
+    The rows the masks can't classify are looked up chord by chord as calc does.
+    """
+    chord_count = len(chord_offsets) - 1
+
+    if chord_count < 2:
+        raise ValueError("At least two chords are needed to calculate pattern stats.")
+
+    masks, codes, is_valid = get_chord_masks(
+        columns, chord_offsets, MAX_MASK_CHORD_SIZE if key_count == 4 else MAX_CODE_CHORD_SIZE
+    )
+
+    # The dummy chord is stored right after the last chord
+    masks = np.append(masks, 1 << DUMMY_CHORD[0])
+    codes = np.append(codes, DUMMY_CHORD[0] + 1)
+    is_valid = np.append(is_valid, True)
+
+    rows = get_rows(times[chord_offsets[:-1]].astype(np.int64))
+    first, second, third = rows[:3]
+    patterns = classify_triples(
+        (masks[first], masks[second], masks[third]),
+        (masks[first] == masks[second]) & (codes[first] == codes[second]),
+        (masks[first] == masks[third]) & (codes[first] == codes[third]),
+        key_count,
+    )
+
+    fallback_rows = np.flatnonzero(
+        ~(is_valid[first] & is_valid[second] & is_valid[third]) | (patterns == NO_PATTERN)
+    )
+    patterns[fallback_rows] = lookup_rows(
+        (first[fallback_rows], second[fallback_rows], third[fallback_rows]),
+        columns,
+        chord_offsets,
+        key_count,
+    )
+
+    return patterns, rows[3]
+
+
+class ClassifiedRows:
+    """
+    The rows of a map, classified once.
+    Rates only scale the time diffs, so the stats of any rate come from the same rows.
+    """
+
+    def __init__(
+        self, times: np.ndarray, columns: np.ndarray, chord_offsets: np.ndarray, key_count: int = 4
+    ) -> None:
+        self.patterns, self.time_diffs = get_row_patterns(times, columns, chord_offsets, key_count)
+        self.time_diffs = self.time_diffs.astype(np.float64)
+        self.line_count = len(chord_offsets) - 1
+
+    def get_pattern_stats(
+        self, pattern_weights: dict[PatternType, float], rate: float = 1.0
+    ) -> dict[PatternType, float]:
+        """
+        Stats of the map played at rate (1.5 for DT, 0.75 for HT)
+        """
+        return self.get_pattern_stats_for_rates(pattern_weights, [rate])[0]
+
+    def get_pattern_stats_for_rates(
+        self, pattern_weights: dict[PatternType, float], rates: Sequence[float]
+    ) -> list[dict[PatternType, float]]:
+        """
+        Stats of the map played at every rate, scored with one vectorized call
+        """
+        rates = np.asarray(rates, dtype=np.float64)
+        points = get_point_from_hold_note_time_diff(
+            self.time_diffs[np.newaxis, :] / rates[:, np.newaxis]
+        )
+
+        results: list[dict[PatternType, float]] = []
+
+        for rate_points in points:
+            rate_sums = np.bincount(self.patterns, weights=rate_points, minlength=len(PatternType))
+            pattern_stats = {pattern: 0.0 for pattern in PatternType}
+
+            for pattern in pattern_stats:
+                if pattern == PatternType.OVERALL:
+                    continue
+
+                pattern_stats[pattern] = float(rate_sums[pattern.value]) * pattern_weights[pattern]
+                pattern_stats[pattern] /= self.line_count
+
+            pattern_stats[PatternType.OVERALL] = sum(pattern_stats.values())
+            results.append(pattern_stats)
+
+        return results
+
+
+def calc_4k_pattern_stats_vectorized(
+    times: np.ndarray,
+    columns: np.ndarray,
+    chord_offsets: np.ndarray,
+    pattern_weights: dict[PatternType, float],
+) -> dict[PatternType, float]:
+    """
+    Calculates pattern stats of chords grouped by chord_offsets (see ColumnarNotes)
+    """
+    return ClassifiedRows(times, columns, chord_offsets).get_pattern_stats(pattern_weights)
+
+
+def calc_hold_note_pattern_stats_for_rates(
+    columns: ColumnarNotes, key_count: int, rates: Sequence[float]
+) -> list[dict[PatternType, float]]:
+    """
+    calc.calc_hold_note_pattern_stats of the map played at every rate,
+    classified once.
+    """
+    return ClassifiedRows(
+        columns.hold_times, columns.columns, columns.chord_offsets, key_count
+    ).get_pattern_stats_for_rates(HOLD_NOTE_PATTERN_WEIGHTS, rates)
+
+
+def calc_4k_hold_note_pattern_stats_for_rates(
+    columns: ColumnarNotes, rates: Sequence[float]
+) -> list[dict[PatternType, float]]:
+    """
+    calc.calc_4k_hold_note_pattern_stats of the map played at every rate,
+    classified once.
+    """
+    return calc_hold_note_pattern_stats_for_rates(columns, 4, rates)
+
+
+def calc_hold_note_pattern_stats_vectorized(
+    columns: ColumnarNotes, key_count: int
+) -> dict[PatternType, float]:
+    """
+    Same as calc.calc_hold_note_pattern_stats
+    """
+    return ClassifiedRows(
+        columns.hold_times, columns.columns, columns.chord_offsets, key_count
+    ).get_pattern_stats(HOLD_NOTE_PATTERN_WEIGHTS)
+
+
+def calc_4k_hold_note_pattern_stats_vectorized(
+    columns: ColumnarNotes,
+) -> dict[PatternType, float]:
+    """
+    Same as calc.calc_4k_hold_note_pattern_stats
+    """
+    return calc_hold_note_pattern_stats_vectorized(columns, 4)
+
+
+def calc_4k_release_note_pattern_stats_vectorized(
+    columns: ColumnarNotes,
+) -> dict[PatternType, float]:
+    """
+    Same as calc.calc_4k_release_note_pattern_stats
+    """
+    return calc_4k_pattern_stats_vectorized(
+        *columns.get_release_chords(), RELEASE_NOTE_PATTERN_WEIGHTS
+    )
+
+
+def from_file(file_path: str) -> dict[str, float]:
+    """
+    Same as calc.from_file
+    """
+    m = parse_columnar_map(file_path)
+    assert m.columns is not None
+
+    return butify_pattern_stats(calc_hold_note_pattern_stats_vectorized(m.columns, m.key_count))
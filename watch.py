@@ -0,0 +1,361 @@
+"""
+This module watches directories of osu maina maps and rates every new or modified map,
+appending one JSON line per map to a log (and optionally updating a corpus index).
+
+Directories are polled, a map is rated once it hasn't changed for the debounce delay.
+New maps are rated on a pool of warm worker processes. The last edited maps are kept
+parsed in the watcher with their [HitObjects] lines, so the next edit of one only parses
+the lines which changed and re-rates the rows they touched (see incremental.py).
+
+python watch.py songs/ --log ratings.ndjson --db corpus.sqlite3
+"""
+# pylint: disable=too-few-public-methods, too-many-instance-attributes
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any
+
+import batch
+import calc
+import map_files
+from corpus import CorpusIndex
+from incremental import IncrementalRater
+from parse import HIT_OBJECTS_SECTION, iter_hit_objects, parse_lines
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 0.5
+
+# Maps kept parsed for incremental re-rating
+DEFAULT_WARM_MAPS = 64
+
+# An edit changing more hit object lines than this is rated from scratch
+MAX_INCREMENTAL_EDITS = 256
+
+FileState = tuple[int, int]  # (mtime_ns, size)
+
+
+def split_hit_object_lines(text: str) -> tuple[list[str], list[str]]:
+    """
+    (the lines up to [HitObjects], the hit object lines) of a map
+    """
+    lines = text.splitlines()
+
+    for i, line in enumerate(lines):
+        if line.strip() == HIT_OBJECTS_SECTION:
+            return lines[: i + 1], lines[i + 1 :]
+
+    return lines, []
+
+
+def diff_lines(old_lines: list[str], new_lines: list[str]) -> tuple[list[str], list[str]]:
+    """
+    (removed lines, added lines) between the common start and the common end of two versions
+    """
+    start = 0
+    end = min(len(old_lines), len(new_lines))
+
+    while start < end and old_lines[start] == new_lines[start]:
+        start += 1
+
+    common_end = 0
+
+    while common_end < end - start and old_lines[-1 - common_end] == new_lines[-1 - common_end]:
+        common_end += 1
+
+    return (
+        old_lines[start : len(old_lines) - common_end],
+        new_lines[start : len(new_lines) - common_end],
+    )
+
+
+class WarmMap:
+    """
+    An edited map kept parsed: its rater, and the lines it was rated from
+    """
+
+    def __init__(
+        self, rater: IncrementalRater, header_lines: list[str], hit_object_lines: list[str]
+    ) -> None:
+        self.rater = rater
+        self.header_lines = header_lines
+        self.hit_object_lines = hit_object_lines
+
+    def apply_edit(self, hit_object_lines: list[str]) -> bool:
+        """
+        Updates the rater with the hit object lines which changed,
+        returns False if it can't (too many changes, or notes which aren't in the map),
+        the rater is then left in an unknown state.
+        """
+        removed_lines, added_lines = diff_lines(self.hit_object_lines, hit_object_lines)
+
+        if len(removed_lines) + len(added_lines) > MAX_INCREMENTAL_EDITS:
+            return False
+
+        key_count = self.rater.key_count
+
+        try:
+            removed = Counter(iter_hit_objects(removed_lines, key_count))
+            added = Counter(iter_hit_objects(added_lines, key_count))
+            # Lines which only moved cancel out
+            removed, added = removed - added, added - removed
+
+            # Adding first, so the map never has less than three chords in between
+            for (index, hold_time, _), count in added.items():
+                for _ in range(count):
+                    self.rater.add_note(index, hold_time)
+
+            for (index, hold_time, _), count in removed.items():
+                for _ in range(count):
+                    self.rater.remove_note(index, hold_time)
+        except (ValueError, IndexError):
+            return False
+
+        self.hit_object_lines = hit_object_lines
+
+        return len(self.rater.times) >= 3
+
+
+def warm_up() -> int:
+    """
+    Makes the pool start a worker (calc is already imported by then)
+    """
+    return os.getpid()
+
+
+class MapWatcher:
+    """
+    Keeps the last seen state of every map of the paths and rates the ones which changed
+    """
+
+    def __init__(
+        self,
+        paths: list[str],
+        debounce: float = DEFAULT_DEBOUNCE,
+        workers: int | None = None,
+        warm_maps: int = DEFAULT_WARM_MAPS,
+    ) -> None:
+        self.paths = paths
+        self.debounce = debounce
+        self.workers = workers or os.cpu_count() or 1
+        self.warm_maps = warm_maps
+        self.executor: ProcessPoolExecutor | None = None
+
+        self.states: dict[str, FileState] = {}
+        # dict[path, (state, time the state was first seen)]
+        self.pending: dict[str, tuple[FileState, float]] = {}
+        self.warm: OrderedDict[str, WarmMap] = OrderedDict()
+        self.polled = False
+
+    def __enter__(self) -> "MapWatcher":
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        for future in [self.executor.submit(warm_up) for _ in range(self.workers)]:
+            future.result()
+
+        return self
+
+    def __exit__(self, *_) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def scan(self) -> dict[str, FileState]:
+        """
+        The current state of every map of the paths
+        """
+        states: dict[str, FileState] = {}
+
+        for path in map_files.find_map_files(self.paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            states[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return states
+
+    def poll(self, now: float, rate_existing: bool = False) -> list[str]:
+        """
+        Records the changes since the last poll, returns the deleted maps.
+        The first poll only records the maps unless rate_existing is set.
+        """
+        states = self.scan()
+        first_poll = not self.polled
+        self.polled = True
+
+        for path, state in states.items():
+            if first_poll and not rate_existing:
+                self.states[path] = state
+            elif self.states.get(path) != state and self.pending.get(path, (None,))[0] != state:
+                self.pending[path] = (state, now)
+
+        deleted = [path for path in self.states if path not in states]
+
+        for path in deleted:
+            del self.states[path]
+            self.warm.pop(path, None)
+
+        # Includes the new maps deleted before they were rated, which aren't reported
+        for path in [path for path in self.pending if path not in states]:
+            del self.pending[path]
+
+        return deleted
+
+    def pop_ready(self, now: float) -> tuple[list[str], list[str]]:
+        """
+        Returns (new maps, edited maps) among the pending maps
+        which haven't changed for the debounce delay
+        """
+        new_paths: list[str] = []
+        edited_paths: list[str] = []
+
+        for path, (state, seen) in list(self.pending.items()):
+            if now - seen < self.debounce:
+                continue
+
+            (edited_paths if path in self.states else new_paths).append(path)
+            self.states[path] = state
+            del self.pending[path]
+
+        return new_paths, edited_paths
+
+    def rate_edit(self, path: str) -> dict[str, Any]:
+        """
+        Re-rates an edited map in this process.
+        A warm map only parses its hit object lines which changed and re-rates the rows
+        around them, other maps are parsed and kept warm for their next edit.
+        """
+        with open(path, "r", encoding="utf-8") as file:
+            header_lines, hit_object_lines = split_hit_object_lines(file.read())
+
+        warm = self.warm.pop(path, None)
+
+        if warm is not None and (
+            warm.header_lines != header_lines or not warm.apply_edit(hit_object_lines)
+        ):
+            warm = None
+
+        if warm is None:
+            m = parse_lines(header_lines + hit_object_lines)
+
+            if len(m.hold_notes_dict) < 3:
+                return {"path": path, "key_count": m.key_count, "stats": calc.from_map(m)}
+
+            warm = WarmMap(IncrementalRater(m), header_lines, hit_object_lines)
+
+        self.warm[path] = warm
+
+        while len(self.warm) > self.warm_maps:
+            self.warm.popitem(last=False)
+
+        return {
+            "path": path,
+            "key_count": warm.rater.key_count,
+            "stats": calc.butify_pattern_stats(warm.rater.get_pattern_stats()),
+        }
+
+    def step(self, now: float, rate_existing: bool = False) -> Iterator[dict[str, Any]]:
+        """
+        Polls once and rates the maps which are ready: edited maps in this process,
+        new maps on the pool. Deleted maps are reported as {"path", "deleted": True}.
+        """
+        for path in self.poll(now, rate_existing):
+            yield {"path": path, "deleted": True}
+
+        new_paths, edited_paths = self.pop_ready(now)
+
+        for path in edited_paths:
+            try:
+                result = self.rate_edit(path)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                result = {"path": path, "error": {"type": type(e).__name__, "message": str(e)}}
+
+            yield result
+
+        if self.executor is None:
+            yield from map(batch.rate_file, new_paths)
+        else:
+            yield from self.executor.map(batch.rate_file, new_paths)
+
+
+def watch(
+    watcher: MapWatcher,
+    log: IO[str],
+    index: CorpusIndex | None = None,
+    interval: float = DEFAULT_INTERVAL,
+    rate_existing: bool = False,
+) -> None:
+    """
+    Polls every interval seconds until interrupted
+    """
+    while True:
+        for result in watcher.step(time.monotonic(), rate_existing):
+            log.write(json.dumps(result) + "\n")
+            log.flush()
+
+            if index is None:
+                continue
+
+            with index.connection:
+                if result.get("deleted"):
+                    index.remove(result["path"])
+                else:
+                    index.put(result)
+
+        time.sleep(interval)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Entry point of the command line
+    """
+    parser = argparse.ArgumentParser(
+        description="Rates osu maina maps as they are added or edited."
+    )
+    parser.add_argument("paths", nargs="+", help="directories, globs or files to watch")
+    parser.add_argument(
+        "--log", default=None, help="NDJSON file the results are appended to (default: stdout)"
+    )
+    parser.add_argument(
+        "--db", default=None, help="corpus index (see corpus.py) to keep up to date"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between polls"
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="seconds a map has to stay unchanged before it is rated",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--rate-existing", action="store_true", help="also rates the maps which are already there"
+    )
+    args = parser.parse_args(argv)
+
+    index = CorpusIndex(args.db) if args.db else None
+    log = open(args.log, "a", encoding="utf-8") if args.log else sys.stdout  # pylint: disable=consider-using-with
+
+    try:
+        with MapWatcher(args.paths, args.debounce, args.workers) as watcher:
+            watch(watcher, log, index, args.interval, args.rate_existing)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if log is not sys.stdout:
+            log.close()
+
+        if index is not None:
+            index.close()
+
+
+if __name__ == "__main__":
+    main()